@@ -16,3 +16,109 @@ DB_NAME = os.environ.get("DB_NAME", "simlady")
 DATABASE_URL = (
     f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 )
+
+# Upload configuration
+# PDFs maiores que o limite (em bytes) são gravados em disco antes da
+# extração; os demais são abertos direto da memória pelo PyMuPDF.
+PDF_SPILL_THRESHOLD = int(os.environ.get("PDF_SPILL_THRESHOLD", "20971520"))
+
+# Execution pools
+# Processos dedicados à extração dos PDFs (fitz + pandas)
+PDF_PROCESS_WORKERS = int(
+    os.environ.get("PDF_PROCESS_WORKERS", str(min(os.cpu_count() or 1, 4)))
+)
+# Threads usadas pelo FastAPI para dependências e consultas síncronas ao banco
+THREADPOOL_SIZE = int(os.environ.get("THREADPOOL_SIZE", "40"))
+# A partir dessa quantidade de páginas a extração é dividida entre os
+# processos do pool. O ponto em que a divisão compensa depende dos núcleos
+# disponíveis: meça com `task bench --workers N` no hardware de produção.
+PDF_PARALLEL_PAGE_THRESHOLD = int(
+    os.environ.get("PDF_PARALLEL_PAGE_THRESHOLD", "32")
+)
+
+# Cache de resultados por conteúdo do PDF
+CACHE_MAX_BYTES = int(os.environ.get("CACHE_MAX_BYTES", "67108864"))
+# Pasta do cache em disco; vazio desativa o nível em disco
+CACHE_DIR = os.environ.get("CACHE_DIR", "")
+CACHE_DISK_MAX_BYTES = int(os.environ.get("CACHE_DISK_MAX_BYTES", "536870912"))
+
+# Quantidade de PDFs processados ao mesmo tempo em /files/{type}/batch
+BATCH_CONCURRENCY = int(os.environ.get("BATCH_CONCURRENCY", "4"))
+
+# Jobs de processamento em segundo plano (/files/{type}/jobs)
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "4"))
+JOB_QUEUE_SIZE = int(os.environ.get("JOB_QUEUE_SIZE", "100"))
+# Tempo (segundos) que o resultado de um job finalizado fica disponível
+JOB_RETENTION_SECONDS = int(os.environ.get("JOB_RETENTION_SECONDS", "3600"))
+
+# Arquivo JSON com os nomes já inferidos por SKU; vazio mantém só em memória
+SKU_MEMO_PATH = os.environ.get("SKU_MEMO_PATH", "")
+# Máximo de nomes por (marca, SKU) mantidos; os menos usados são descartados
+SKU_MEMO_MAX_ENTRIES = int(os.environ.get("SKU_MEMO_MAX_ENTRIES", "100000"))
+
+# Índice do catálogo para associar descrições da nota a produtos existentes
+# Confiança mínima (0 a 1) para usar o nome do catálogo sem chamar o Gemini
+CATALOG_MATCH_THRESHOLD = float(
+    os.environ.get("CATALOG_MATCH_THRESHOLD", "0.75")
+)
+# Intervalo (segundos) entre atualizações incrementais do índice
+CATALOG_REFRESH_SECONDS = int(os.environ.get("CATALOG_REFRESH_SECONDS", "300"))
+
+# Cliente do Gemini compartilhado entre a ingestão e o CRM
+# Tempo máximo (segundos) de cada requisição ao Gemini
+GEMINI_TIMEOUT_SECONDS = int(os.environ.get("GEMINI_TIMEOUT_SECONDS", "60"))
+# Conexões HTTP abertas ao mesmo tempo e quantas ficam reaproveitáveis
+GEMINI_MAX_CONNECTIONS = int(os.environ.get("GEMINI_MAX_CONNECTIONS", "20"))
+GEMINI_MAX_KEEPALIVE = int(os.environ.get("GEMINI_MAX_KEEPALIVE", "10"))
+# Tempo (segundos) que uma conexão ociosa é mantida aberta
+GEMINI_KEEPALIVE_SECONDS = int(
+    os.environ.get("GEMINI_KEEPALIVE_SECONDS", "30")
+)
+
+# Cache das respostas do CRM (/crm/*)
+# Tempo (segundos) em que a resposta é servida sem consultar o banco
+CRM_CACHE_TTL_SECONDS = int(os.environ.get("CRM_CACHE_TTL_SECONDS", "300"))
+# Depois do TTL, por quanto tempo a resposta antiga ainda é servida
+# enquanto uma atualização roda em segundo plano
+CRM_CACHE_STALE_SECONDS = int(
+    os.environ.get("CRM_CACHE_STALE_SECONDS", "3600")
+)
+CRM_CACHE_MAX_ENTRIES = int(os.environ.get("CRM_CACHE_MAX_ENTRIES", "256"))
+
+# Provedor do LLM: "gemini" ou "stub" (respostas locais para testes de carga)
+LLM_PROVIDER = os.environ.get("LLM_PROVIDER", "gemini")
+GEMINI_MODEL = os.environ.get("GEMINI_MODEL", "gemini-2.0-flash")
+# Latência simulada pelo stub (milissegundos, ± jitter)
+LLM_STUB_LATENCY_MS = int(os.environ.get("LLM_STUB_LATENCY_MS", "300"))
+LLM_STUB_JITTER_MS = int(os.environ.get("LLM_STUB_JITTER_MS", "100"))
+# Fração (0 a 1) das chamadas ao stub que falham, e com qual status HTTP
+LLM_STUB_ERROR_RATE = float(os.environ.get("LLM_STUB_ERROR_RATE", "0"))
+LLM_STUB_ERROR_CODE = int(os.environ.get("LLM_STUB_ERROR_CODE", "503"))
+
+# Gateway das chamadas ao LLM (ingestão e CRM)
+# Chamadas simultâneas no início; o limite se ajusta até o máximo
+LLM_CONCURRENCY_INITIAL = int(os.environ.get("LLM_CONCURRENCY_INITIAL", "8"))
+LLM_CONCURRENCY_MAX = int(os.environ.get("LLM_CONCURRENCY_MAX", "32"))
+# Tempo máximo (segundos) de espera na fila antes de recusar a chamada
+LLM_QUEUE_TIMEOUT_SECONDS = float(
+    os.environ.get("LLM_QUEUE_TIMEOUT_SECONDS", "30")
+)
+# Tokens (prompt + resposta) por minuto; 0 desativa o orçamento
+LLM_TOKENS_PER_MINUTE = int(os.environ.get("LLM_TOKENS_PER_MINUTE", "0"))
+# Tentativas por chamada e backoff (milissegundos) entre elas
+LLM_MAX_ATTEMPTS = int(os.environ.get("LLM_MAX_ATTEMPTS", "3"))
+LLM_RETRY_BASE_MS = int(os.environ.get("LLM_RETRY_BASE_MS", "500"))
+LLM_RETRY_MAX_MS = int(os.environ.get("LLM_RETRY_MAX_MS", "8000"))
+# Falhas seguidas que abrem o circuito e por quanto tempo (segundos) ele
+# recusa as chamadas antes de testar o LLM de novo
+LLM_BREAKER_FAILURES = int(os.environ.get("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_RESET_SECONDS = int(
+    os.environ.get("LLM_BREAKER_RESET_SECONDS", "30")
+)
+# Hedging das chamadas do CRM: passado o percentil (0 a 100) das latências
+# recentes, uma cópia da chamada é enviada e vale a primeira resposta
+LLM_HEDGE_PERCENTILE = float(os.environ.get("LLM_HEDGE_PERCENTILE", "95"))
+# Fração máxima (0 a 1) das chamadas que recebem cópia; 0 desativa
+LLM_HEDGE_MAX_RATE = float(os.environ.get("LLM_HEDGE_MAX_RATE", "0"))
+# Latências observadas antes de começar a enviar cópias
+LLM_HEDGE_MIN_SAMPLES = int(os.environ.get("LLM_HEDGE_MIN_SAMPLES", "20"))
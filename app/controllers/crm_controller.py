@@ -2,15 +2,22 @@
 
 import json
 import os
+from collections.abc import AsyncIterator
 from datetime import datetime, timedelta
+from functools import partial
 from typing import Dict, Tuple
 
 from fastapi import HTTPException, status
-from google import genai
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy import func
 from sqlalchemy.orm import Session
 
-from app.config import GEMINI_API_KEY
+from app.config import (
+    CRM_CACHE_MAX_ENTRIES,
+    CRM_CACHE_STALE_SECONDS,
+    CRM_CACHE_TTL_SECONDS,
+)
+from app.db.database import SessionLocal
 from app.db.models import (
     Marca,
     Pedido,
@@ -19,9 +26,15 @@ from app.db.models import (
     Usuario,
     Venda,
 )
+from app.gemini.gateway import gateway, unavailable
+from app.manager.flight_manager import FlightManager, Publish
+from app.manager.insight_manager import InsightManager, fingerprint
 from app.utils import json_transform
 
-client = genai.Client(api_key=GEMINI_API_KEY)
+flight_manager = FlightManager()
+insight_manager = InsightManager(
+    CRM_CACHE_TTL_SECONDS, CRM_CACHE_STALE_SECONDS, CRM_CACHE_MAX_ENTRIES
+)
 
 
 def _read_prompt(filename: str) -> str:
@@ -57,6 +70,246 @@ def _get_periodo_dates(periodo: str) -> Tuple[datetime, datetime]:
     return inicio, fim
 
 
+def _contents(prompt_file: str, dados: Dict) -> str:
+    """Prompt da rota seguido dos dados agregados em JSON"""
+    dados_json = json.dumps(dados, ensure_ascii=False, indent=2)
+    prompt = _read_prompt(prompt_file)
+
+    return f"{prompt}\n\nDados:\n{dados_json}"
+
+
+async def _generate(
+    prompt_file: str, dados: Dict, publish: Publish | None = None
+):
+    """
+    Envia o prompt com os dados agregados ao Gemini e converte o JSON. Com
+    publish, o texto é pedido em partes e cada uma vira um evento "chunk".
+    """
+    contents = _contents(prompt_file, dados)
+
+    if publish is None:
+        # Chama Gemini pelo gateway compartilhado com a ingestão; as
+        # latências de cada prompt definem quando vale enviar uma cópia
+        response = await gateway.generate(contents, hedge=prompt_file)
+        return json_transform.convert_json(response.text)
+
+    parts = []
+    async for chunk in gateway.stream(contents):
+        if chunk.text:
+            parts.append(chunk.text)
+            publish(("chunk", chunk.text))
+
+    return json_transform.convert_json("".join(parts))
+
+
+def _fallback(key: tuple, dados: Dict, error: Exception):
+    """
+    Resposta com o Gemini indisponível: a última gerada para a rota, mesmo
+    vencida, ou um aviso com os dados agregados. Nenhuma vai para o cache.
+    """
+    entry = insight_manager.peek(key)
+    if entry is not None:
+        return entry["valor"]
+
+    return {
+        "indisponivel": True,
+        "detalhe": f"Análise por IA indisponível no momento: {str(error)}",
+        "dados": dados,
+    }
+
+
+def _reuse(key: tuple, data_fingerprint: str, regenerate: bool):
+    """Entrada do cache gerada a partir dos mesmos dados agregados"""
+    entry = insight_manager.peek(key)
+
+    if (
+        regenerate
+        or entry is None
+        or entry["fingerprint"] != data_fingerprint
+    ):
+        return None
+
+    insight_manager.touch(key)
+    return entry
+
+
+async def _store(
+    name: str,
+    periodo: str,
+    dados: Dict,
+    regenerate: bool,
+    publish: Publish | None = None,
+):
+    """
+    Gera e guarda a resposta da rota. Se os dados agregados não mudaram
+    desde a última geração, reaproveita a resposta sem chamar o Gemini.
+    """
+    key = (name, periodo)
+    data_fingerprint = fingerprint(dados)
+
+    entry = _reuse(key, data_fingerprint, regenerate)
+    if entry is not None:
+        return entry["valor"]
+
+    try:
+        resultado = await _generate(INSIGHTS[name]["prompt"], dados, publish)
+    except Exception as e:
+        if not unavailable(e):
+            raise
+        return _fallback(key, dados, e)
+
+    insight_manager.set(key, resultado, data_fingerprint)
+
+    return resultado
+
+
+def _collect(name: str, periodo: str) -> Dict:
+    """
+    Consulta os dados com uma sessão própria: a execução pode ser
+    compartilhada por várias requisições e sobreviver a qualquer uma delas.
+    """
+    with SessionLocal() as db:
+        return INSIGHTS[name]["dados"](db, periodo)
+
+
+async def _compute(
+    name: str, periodo: str, regenerate: bool, stream: bool, publish: Publish
+):
+    """
+    Execução compartilhada da rota. Publica os eventos da variante SSE;
+    quando quem a iniciou foi a variante SSE, o texto do Gemini também é
+    publicado conforme é gerado.
+    """
+    # Coleta dados do banco (consultas síncronas no threadpool)
+    dados = await run_in_threadpool(_collect, name, periodo)
+    publish(("dados", dados))
+
+    resultado = await _store(
+        name, periodo, dados, regenerate, publish if stream else None
+    )
+    publish(("resultado", resultado))
+
+    return resultado
+
+
+async def _shared(name: str, periodo: str, regenerate: bool):
+    """
+    Requisições idênticas simultâneas (e a atualização em segundo plano)
+    compartilham as mesmas consultas e a mesma chamada ao Gemini.
+    """
+    return await flight_manager.do(
+        (name, periodo, regenerate),
+        partial(_compute, name, periodo, regenerate, False),
+    )
+
+
+def _error(insight: Dict, error: Exception) -> HTTPException:
+    if isinstance(error, FileNotFoundError):
+        return HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Arquivo de prompt não encontrado: {str(error)}",
+        )
+
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail=f"{insight['erro']}: {str(error)}",
+    )
+
+
+def _cached(name: str, periodo: str):
+    """Resposta em cache da rota, atualizada em segundo plano se vencida"""
+    key = (name, periodo)
+    entry, fresh = insight_manager.get(key)
+
+    if entry is None:
+        return None
+
+    if not fresh:
+        insight_manager.revalidate(
+            key, partial(_shared, name, periodo, False)
+        )
+
+    return entry
+
+
+async def _insight(name: str, periodo: str, bypass_cache: bool):
+    """Resposta da rota do CRM, servida do cache sempre que possível"""
+    try:
+        entry = None if bypass_cache else _cached(name, periodo)
+        if entry is not None:
+            return entry["valor"]
+
+        return await _shared(name, periodo, bypass_cache)
+
+    except Exception as e:
+        raise _error(INSIGHTS[name], e)
+
+
+def _event(event: str, data) -> str:
+    """Evento no formato server-sent events, com os dados em JSON"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def _relay(
+    insight: Dict, first: tuple, events: AsyncIterator | None = None
+) -> AsyncIterator[str]:
+    yield _event(*first)
+
+    if events is None:
+        return
+
+    try:
+        async for event in events:
+            yield _event(*event)
+    except Exception as e:
+        # Com o status 200 já enviado, o erro só pode ir no próprio stream
+        yield _event("erro", {"detail": f"{insight['erro']}: {str(e)}"})
+
+
+async def stream_insight(
+    name: str, periodo: str = "mes_atual", bypass_cache: bool = False
+) -> AsyncIterator[str]:
+    """
+    Variante SSE das rotas do CRM. Envia os dados agregados (evento
+    "dados") assim que as consultas terminam, o texto do Gemini conforme é
+    gerado (eventos "chunk") e o JSON final (evento "resultado"). Com a
+    resposta em cache, apenas o evento "resultado" é enviado.
+
+    Usa o mesmo cache e a mesma execução compartilhada da rota JSON: quem
+    chega com uma execução em andamento recebe os eventos já publicados e
+    os seguintes (sem "chunk" se ela foi iniciada pela rota JSON). Falhas
+    até os dados agregados são lançadas como HTTPException, antes de a
+    resposta começar.
+    """
+    insight = INSIGHTS[name]
+
+    try:
+        _read_prompt(insight["prompt"])
+
+        entry = None if bypass_cache else _cached(name, periodo)
+        if entry is not None:
+            return _relay(insight, ("resultado", entry["valor"]))
+
+        events = flight_manager.subscribe(
+            (name, periodo, bypass_cache),
+            partial(_compute, name, periodo, bypass_cache, True),
+        )
+        first = await anext(events)
+
+    except Exception as e:
+        raise _error(insight, e)
+
+    return _relay(insight, first, events)
+
+
+def get_stats() -> dict:
+    return {
+        "cache": insight_manager.stats(),
+        "single_flight": flight_manager.stats(),
+        "llm": gateway.stats(),
+    }
+
+
 def _get_relatorio_financeiro_data(db: Session, periodo: str = "mes_atual") -> Dict:
     """Coleta dados agregados para relatório financeiro"""
     data_inicio, data_fim = _get_periodo_dates(periodo)
@@ -172,36 +425,11 @@ def _get_relatorio_financeiro_data(db: Session, periodo: str = "mes_atual") -> D
     }
 
 
-def get_relatorio_financeiro(db: Session, periodo: str = "mes_atual"):
+async def get_relatorio_financeiro(
+    periodo: str = "mes_atual", bypass_cache: bool = False
+):
     """Gera relatório financeiro resumido usando Gemini"""
-    try:
-        # Coleta dados do banco
-        dados = _get_relatorio_financeiro_data(db, periodo)
-        dados_json = json.dumps(dados, ensure_ascii=False, indent=2)
-
-        # Lê o prompt
-        prompt = _read_prompt("relatorio_financeiro.txt")
-
-        # Chama Gemini
-        response = client.models.generate_content(
-            model="gemini-2.0-flash",
-            contents=f"{prompt}\n\nDados:\n{dados_json}",
-        )
-
-        # Converte resposta para JSON
-        resultado = json_transform.convert_json(response.text)
-        return resultado
-
-    except FileNotFoundError as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Arquivo de prompt não encontrado: {str(e)}",
-        )
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Erro ao gerar relatório financeiro: {str(e)}",
-        )
+    return await _insight("relatorio-financeiro", periodo, bypass_cache)
 
 
 def _get_alertas_reabastecimento_data(db: Session, periodo: str = "mes_atual") -> Dict:
@@ -279,36 +507,13 @@ def _get_alertas_reabastecimento_data(db: Session, periodo: str = "mes_atual") -
     }
 
 
-def get_alertas_reabastecimento(db: Session, periodo: str = "mes_atual"):
+async def get_alertas_reabastecimento(
+    periodo: str = "mes_atual", bypass_cache: bool = False
+):
     """Gera alertas de reabastecimento usando Gemini"""
-    try:
-        # Coleta dados do banco
-        dados = _get_alertas_reabastecimento_data(db, periodo)
-        dados_json = json.dumps(dados, ensure_ascii=False, indent=2)
-
-        # Lê o prompt
-        prompt = _read_prompt("alertas_reabastecimento.txt")
-
-        # Chama Gemini
-        response = client.models.generate_content(
-            model="gemini-2.0-flash",
-            contents=f"{prompt}\n\nDados:\n{dados_json}",
-        )
-
-        # Converte resposta para JSON
-        resultado = json_transform.convert_json(response.text)
-        return resultado
-
-    except FileNotFoundError as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Arquivo de prompt não encontrado: {str(e)}",
-        )
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Erro ao gerar alertas de reabastecimento: {str(e)}",
-        )
+    return await _insight(
+        "alertas-reabastecimento", periodo, bypass_cache
+    )
 
 
 def _get_previsao_demanda_data(db: Session, periodo: str = "mes_atual") -> Dict:
@@ -377,36 +582,11 @@ def _get_previsao_demanda_data(db: Session, periodo: str = "mes_atual") -> Dict:
     }
 
 
-def get_previsao_demanda(db: Session, periodo: str = "mes_atual"):
+async def get_previsao_demanda(
+    periodo: str = "mes_atual", bypass_cache: bool = False
+):
     """Gera previsão de demanda usando Gemini"""
-    try:
-        # Coleta dados do banco
-        dados = _get_previsao_demanda_data(db, periodo)
-        dados_json = json.dumps(dados, ensure_ascii=False, indent=2)
-
-        # Lê o prompt
-        prompt = _read_prompt("previsao_demanda.txt")
-
-        # Chama Gemini
-        response = client.models.generate_content(
-            model="gemini-2.0-flash",
-            contents=f"{prompt}\n\nDados:\n{dados_json}",
-        )
-
-        # Converte resposta para JSON
-        resultado = json_transform.convert_json(response.text)
-        return resultado
-
-    except FileNotFoundError as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Arquivo de prompt não encontrado: {str(e)}",
-        )
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Erro ao gerar previsão de demanda: {str(e)}",
-        )
+    return await _insight("previsao-demanda", periodo, bypass_cache)
 
 
 def _get_proxima_acao_data(db: Session, periodo: str = "mes_atual") -> Dict:
@@ -503,34 +683,33 @@ def _get_proxima_acao_data(db: Session, periodo: str = "mes_atual") -> Dict:
     }
 
 
-def get_proxima_acao(db: Session, periodo: str = "mes_atual"):
+async def get_proxima_acao(
+    periodo: str = "mes_atual", bypass_cache: bool = False
+):
     """Gera sugestão de próxima melhor ação usando Gemini"""
-    try:
-        # Coleta dados do banco
-        dados = _get_proxima_acao_data(db, periodo)
-        dados_json = json.dumps(dados, ensure_ascii=False, indent=2)
-
-        # Lê o prompt
-        prompt = _read_prompt("proxima_acao.txt")
-
-        # Chama Gemini
-        response = client.models.generate_content(
-            model="gemini-2.0-flash",
-            contents=f"{prompt}\n\nDados:\n{dados_json}",
-        )
-
-        # Converte resposta para JSON
-        resultado = json_transform.convert_json(response.text)
-        return resultado
-
-    except FileNotFoundError as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Arquivo de prompt não encontrado: {str(e)}",
-        )
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Erro ao gerar sugestão de próxima ação: {str(e)}",
-        )
-
+    return await _insight("proxima-acao", periodo, bypass_cache)
+
+
+# Dados, prompt e mensagem de erro de cada rota do CRM
+INSIGHTS = {
+    "relatorio-financeiro": {
+        "dados": _get_relatorio_financeiro_data,
+        "prompt": "relatorio_financeiro.txt",
+        "erro": "Erro ao gerar relatório financeiro",
+    },
+    "alertas-reabastecimento": {
+        "dados": _get_alertas_reabastecimento_data,
+        "prompt": "alertas_reabastecimento.txt",
+        "erro": "Erro ao gerar alertas de reabastecimento",
+    },
+    "previsao-demanda": {
+        "dados": _get_previsao_demanda_data,
+        "prompt": "previsao_demanda.txt",
+        "erro": "Erro ao gerar previsão de demanda",
+    },
+    "proxima-acao": {
+        "dados": _get_proxima_acao_data,
+        "prompt": "proxima_acao.txt",
+        "erro": "Erro ao gerar sugestão de próxima ação",
+    },
+}
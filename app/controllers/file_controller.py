@@ -1,37 +1,530 @@
 """File Controller"""
 
+import asyncio
+import hashlib
+import json
+import logging
+from collections.abc import AsyncIterator, Awaitable, Callable
+from functools import partial
+
 from fastapi import HTTPException, UploadFile, status
+from fastapi.concurrency import run_in_threadpool
 
+from app.config import (
+    BATCH_CONCURRENCY,
+    CACHE_DIR,
+    CACHE_DISK_MAX_BYTES,
+    CACHE_MAX_BYTES,
+    CATALOG_MATCH_THRESHOLD,
+    CATALOG_REFRESH_SECONDS,
+    JOB_QUEUE_SIZE,
+    JOB_RETENTION_SECONDS,
+    JOB_WORKERS,
+    PDF_PARALLEL_PAGE_THRESHOLD,
+    PDF_PROCESS_WORKERS,
+    PDF_SPILL_THRESHOLD,
+    SKU_MEMO_MAX_ENTRIES,
+    SKU_MEMO_PATH,
+)
+from app.gemini import gen
+from app.gemini.gateway import gateway, unavailable
+from app.manager.cache_manager import CacheManager
+from app.manager.catalog_manager import CatalogManager
+from app.manager.job_manager import JobManager
 from app.manager.path_manager import PathManager
+from app.manager.pool_manager import PoolManager
+from app.manager.product_manager import ProductManager
+from app.manager.sku_manager import SkuManager
 from app.utils import pdf_extraction
 
+logger = logging.getLogger(__name__)
+
 path_manager = PathManager()
+pool_manager = PoolManager(PDF_PROCESS_WORKERS)
+cache_manager = CacheManager(
+    CACHE_MAX_BYTES, CACHE_DIR or None, CACHE_DISK_MAX_BYTES
+)
+sku_manager = SkuManager(SKU_MEMO_PATH or None, SKU_MEMO_MAX_ENTRIES)
+catalog_manager = CatalogManager(CATALOG_REFRESH_SECONDS)
+job_manager = JobManager(JOB_WORKERS, JOB_QUEUE_SIZE, JOB_RETENTION_SECONDS)
+product_manager = ProductManager()
+
+# Dividir o PDF entre processos só faz sentido com ao menos duas faixas
+MIN_SHARDS = 2
+
+
+def _digest(pdf: str | bytes) -> str:
+    if isinstance(pdf, str):
+        with open(pdf, "rb") as f:
+            return hashlib.file_digest(f, "sha256").hexdigest()
+
+    return hashlib.sha256(pdf).hexdigest()
+
+
+async def content_hash(pdf: str | bytes) -> str:
+    """SHA-256 do conteúdo do PDF, em memória ou no disco"""
+    # Uploads grandes são lidos do disco: o hash roda no threadpool
+    return await run_in_threadpool(_digest, pdf)
 
 
-async def create_file(type: str, file: UploadFile):
+async def extract_products(type: str, pdf: str | bytes) -> list[dict]:
+    """Extrai os produtos do PDF, dividindo documentos longos por páginas"""
+    # Só conta as páginas: roda no threadpool para não bloquear o event
+    # loop e sem enviar o PDF para outro processo
+    pages = await run_in_threadpool(pdf_extraction.page_count, pdf)
+
+    if (
+        pages < PDF_PARALLEL_PAGE_THRESHOLD
+        or pool_manager.max_workers < MIN_SHARDS
+    ):
+        return await pool_manager.run(pdf_extraction.extract_text, type, pdf)
+
+    # As faixas recebem o caminho do arquivo, e não uma cópia dos bytes
+    # cada uma; PDFs em memória são gravados uma única vez
+    workspace = None
+    if not isinstance(pdf, str):
+        workspace = path_manager.create_workspace()
+
     try:
-        pdf_path = path_manager.create_path(path_manager.path_pdf, file)
+        if workspace:
+            pdf = await run_in_threadpool(
+                path_manager.write_file, workspace, "documento.pdf", pdf
+            )
+
+        shards = pdf_extraction.shard_pages(pages, pool_manager.max_workers)
+        parts = await asyncio.gather(
+            *(
+                pool_manager.run(
+                    pdf_extraction.extract_pages, type, pdf, start, stop
+                )
+                for start, stop in shards
+            )
+        )
+
+        rows = pdf_extraction.join_pages(parts)
+        if rows is None:
+            # Uma faixa começa em página sem cabeçalho no meio da tabela:
+            # o layout vem da página anterior, então lê tudo de uma vez
+            return await pool_manager.run(
+                pdf_extraction.extract_text, type, pdf
+            )
+    finally:
+        if workspace:
+            path_manager.remove_workspace(workspace)
+
+    return await pool_manager.run(pdf_extraction.build_products, type, rows)
 
-        with open(pdf_path, "wb") as p:
-            pdf = await file.read()
-            p.write(pdf)
 
-        exists_path = path_manager.exists_path(pdf_path)
+async def read_upload(
+    file: UploadFile, spill: bool = False
+) -> tuple[str | bytes, str | None]:
+    """
+    Lê o upload em memória ou, acima de PDF_SPILL_THRESHOLD (ou sempre,
+    com spill), grava em uma pasta temporária da requisição. Devolve o PDF
+    e essa pasta (ou None).
+    """
+    # Lê no máximo o limite + 1 byte para decidir se o PDF cabe em memória
+    pdf = await file.read(PDF_SPILL_THRESHOLD + 1)
 
-        if not exists_path:
+    if len(pdf) <= PDF_SPILL_THRESHOLD and not spill:
+        return pdf, None
+
+    workspace = path_manager.create_workspace()
+    try:
+        pdf_path = path_manager.create_path(workspace, file)
+        await path_manager.save_upload(file, pdf_path, head=pdf)
+
+        if not path_manager.exists_path(pdf_path):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Falha ao salvar o arquivo",
             )
+    except Exception:
+        path_manager.remove_workspace(workspace)
+        raise
+
+    return pdf_path, workspace
 
-        response = pdf_extraction.extract_text(type, pdf_path)
 
-        return response
+async def name_products(
+    module, products: list[dict]
+) -> tuple[list[dict], bool]:
+    """
+    Completa o nome dos produtos: SKUs já conhecidos vêm da memória de
+    SKUs, descrições parecidas com produtos da marca no catálogo usam o
+    nome cadastrado e apenas o restante é enviado ao Gemini.
+
+    Devolve também se todos os nomes foram resolvidos. Com o Gemini
+    indisponível, os produtos restantes mantêm a descrição da nota como
+    nome e são marcados com "nomePendente": o resultado não vai para o
+    cache, para a memória de SKUs nem para o banco.
+    """
+    skus = list(dict.fromkeys(product["sku"] for product in products))
+    names = await sku_manager.resolve(module.BRAND, skus)
+
+    pending = [product for product in products if product["sku"] not in names]
+    if pending:
+        await catalog_manager.ensure_fresh()
+
+        matches = await catalog_manager.match_many(
+            module.BRAND, [product["descricao"] for product in pending]
+        )
+        matched = {
+            product["sku"]: match
+            for product, match in zip(pending, matches)
+            if match and match[1] >= CATALOG_MATCH_THRESHOLD
+        }
+
+        # Só a correspondência exata vira memória permanente; a parecida
+        # vale para esta nota e é conferida de novo na próxima
+        await sku_manager.remember(
+            module.BRAND,
+            {
+                sku: name
+                for sku, (name, score) in matched.items()
+                if score >= 1
+            },
+        )
+        names.update({sku: name for sku, (name, _) in matched.items()})
+        pending = [
+            product for product in pending if product["sku"] not in names
+        ]
+
+    if pending:
+        try:
+            generated = await gen.gen_names(
+                pending, module.BRAND, module.PROMPT_COLUMNS
+            )
+        except Exception as e:
+            if not unavailable(e):
+                raise
+            logger.warning(
+                "%d produtos sem nome gerado: %s", len(pending), str(e)
+            )
+            generated = {}
+
+        await sku_manager.remember(module.BRAND, generated)
+        names.update(generated)
+
+    products = gen.apply_names(products, names)
+    for product in products:
+        product["nomePendente"] = not names.get(product["sku"])
+
+    return products, not any(p["nomePendente"] for p in products)
+
+
+def _check_names(products: list[dict]):
+    """
+    Recusa gravar uma nota com nomes pendentes: o banco é consultado como
+    memória de SKUs e a descrição da nota passaria a valer como nome.
+    """
+    if any(product.get("nomePendente") for product in products):
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=(
+                "Nome dos produtos indisponível no momento: a nota não foi "
+                "gravada, tente novamente mais tarde"
+            ),
+        )
+
+
+async def resolve_type(type: str, pdf: str | bytes) -> str:
+    if type != pdf_extraction.AUTO_TYPE:
+        return type
+
+    detected = await pool_manager.run(pdf_extraction.detect_type, pdf)
+
+    if detected is None:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Formato do PDF não reconhecido por nenhum módulo",
+        )
+
+    return detected
+
+
+async def process_pdf(
+    type: str,
+    pdf: str | bytes,
+    bypass_cache: bool = False,
+    persist: bool = False,
+):
+    type = await resolve_type(type, pdf)
+    module = pdf_extraction.get_module(type)
+
+    digest = await content_hash(pdf)
+    cache_key = cache_manager.key(digest, type, gen.prompt_version())
+
+    response = None if bypass_cache else await cache_manager.get(cache_key)
+
+    if response is None:
+        # Parsing no pool de processos, chamada ao Gemini no cliente async
+        products = await extract_products(type, pdf)
+        response, complete = await name_products(module, products)
+
+        if complete:
+            await cache_manager.set(cache_key, response)
+
+    if persist:
+        _check_names(response)
+        # Apenas a primeira nota do PDF é lida: a chave dela identifica a
+        # gravação, e a mesma nota enviada de novo não soma o estoque
+        key = await run_in_threadpool(pdf_extraction.access_key, pdf)
+        await product_manager.persist(response, module.BRAND, key or digest)
+
+    return response
+
+
+async def create_file(
+    type: str,
+    file: UploadFile,
+    bypass_cache: bool = False,
+    persist: bool = False,
+):
+    pdf_extraction.check_type(type)
+    workspace = None
+
+    try:
+        pdf, workspace = await read_upload(file)
+
+        return await process_pdf(type, pdf, bypass_cache, persist)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"{str(e)}",
         )
     finally:
-        path_manager.remove_path(pdf_path)
-        path_manager.remove_path(path_manager.path_product)
+        if workspace:
+            path_manager.remove_workspace(workspace)
+
+
+async def create_batch(
+    type: str,
+    files: list[UploadFile],
+    bypass_cache: bool = False,
+    persist: bool = False,
+):
+    """
+    Processa vários PDFs na mesma requisição. Com mais de um arquivo em
+    andamento, a extração do próximo PDF no pool de processos se sobrepõe
+    à chamada ao Gemini do anterior.
+    """
+    pdf_extraction.check_type(type)
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def process(file: UploadFile) -> dict:
+        async with semaphore:
+            try:
+                produtos = await create_file(type, file, bypass_cache, persist)
+                return {
+                    "arquivo": file.filename,
+                    "status": "sucesso",
+                    "produtos": produtos,
+                }
+            except HTTPException as e:
+                return {
+                    "arquivo": file.filename,
+                    "status": "erro",
+                    "erro": e.detail,
+                }
+
+    return await asyncio.gather(*(process(file) for file in files))
+
+
+async def process_invoice(
+    type: str,
+    document: tuple[str, str],
+    invoice: tuple[int, int, str | None],
+    bypass_cache: bool = False,
+    persist: bool = False,
+) -> list[dict]:
+    """
+    Processa apenas as páginas [início, fim) de uma nota do documento.
+    document é o (caminho, SHA-256) do PDF: o processo do pool abre o
+    arquivo e lê só essas páginas, sem receber o PDF inteiro.
+    """
+    path, digest = document
+    start, stop, access_key = invoice
+    module = pdf_extraction.get_module(type)
+    pages = f"{start}:{stop}"
+    cache_key = cache_manager.key(digest, type, gen.prompt_version(), pages)
+
+    response = None if bypass_cache else await cache_manager.get(cache_key)
+
+    if response is None:
+        products = await pool_manager.run(
+            pdf_extraction.extract_text, type, path, start, stop
+        )
+        response, complete = await name_products(module, products)
+
+        if complete:
+            await cache_manager.set(cache_key, response)
+
+    if persist:
+        _check_names(response)
+        key = access_key or cache_manager.key(digest, pages)
+        await product_manager.persist(response, module.BRAND, key)
+
+    return response
+
+
+async def _stream_invoices(
+    invoices: list[tuple[int, int, str | None]],
+    process: Callable[[tuple[int, int, str | None]], Awaitable[list[dict]]],
+) -> AsyncIterator[bytes]:
+    """
+    Gera uma linha NDJSON por nota, na ordem do documento. A nota seguinte
+    é processada enquanto a atual é enviada, então no máximo duas notas
+    ficam em memória.
+    """
+
+    def start(index: int) -> asyncio.Task | None:
+        if index >= len(invoices):
+            return None
+
+        return asyncio.create_task(process(invoices[index]))
+
+    task = start(0)
+
+    try:
+        for index, (first, last, key) in enumerate(invoices):
+            current, task = task, start(index + 1)
+            line = {
+                "nota": index + 1,
+                "chave": key,
+                "paginas": [first + 1, last],
+            }
+
+            try:
+                line["produtos"] = await current
+                line["status"] = "sucesso"
+            except HTTPException as e:
+                line["status"] = "erro"
+                line["erro"] = e.detail
+            except Exception as e:
+                line["status"] = "erro"
+                line["erro"] = str(e)
+
+            yield (json.dumps(line, ensure_ascii=False) + "\n").encode("utf-8")
+    finally:
+        if task:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+
+async def stream_file(
+    type: str,
+    file: UploadFile,
+    bypass_cache: bool = False,
+    persist: bool = False,
+) -> tuple[AsyncIterator[bytes], Callable[[], None]]:
+    """
+    Divide o PDF nas notas que ele contém (pela chave de acesso) e devolve
+    um gerador com o resultado de cada nota assim que ela fica pronta.
+
+    O PDF fica em uma pasta temporária enquanto as notas são lidas; a
+    função de limpeza devolvida junto deve rodar ao fim da resposta
+    (BackgroundTask), mesmo que o cliente desconecte antes do início.
+    """
+    pdf_extraction.check_type(type)
+    workspace = None
+
+    try:
+        # As notas são lidas por faixa de páginas a partir do arquivo
+        pdf, workspace = await read_upload(file, spill=True)
+        type = await resolve_type(type, pdf)
+        invoices = await pool_manager.run(pdf_extraction.split_invoices, pdf)
+        digest = await content_hash(pdf)
+    except Exception as e:
+        if workspace:
+            path_manager.remove_workspace(workspace)
+        if isinstance(e, HTTPException):
+            raise
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"{str(e)}",
+        )
+
+    process = partial(
+        process_invoice,
+        type,
+        (pdf, digest),
+        bypass_cache=bypass_cache,
+        persist=persist,
+    )
+
+    return (
+        _stream_invoices(invoices, process),
+        partial(path_manager.remove_workspace, workspace),
+    )
+
+
+async def create_job(
+    type: str,
+    file: UploadFile,
+    bypass_cache: bool = False,
+    persist: bool = False,
+) -> dict:
+    """
+    Enfileira o PDF e devolve o id do job sem esperar o processamento. O
+    PDF aguarda na fila gravado em disco, não em memória.
+    """
+    pdf_extraction.check_type(type)
+
+    try:
+        pdf, workspace = await read_upload(file, spill=True)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"{str(e)}",
+        )
+
+    try:
+        job = job_manager.submit(
+            process_pdf,
+            type,
+            pdf,
+            bypass_cache,
+            persist,
+            cleanup=partial(path_manager.remove_workspace, workspace),
+        )
+    except asyncio.QueueFull:
+        path_manager.remove_workspace(workspace)
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Fila de processamento cheia, tente novamente mais tarde",
+        )
+
+    return {"id": job["id"], "status": job["status"]}
+
+
+def get_job(job_id: str) -> dict:
+    job = job_manager.get(job_id)
+
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Job {job_id} não encontrado",
+        )
+
+    return job
+
+
+def get_job_stats() -> dict:
+    return job_manager.stats()
+
+
+def get_stats() -> dict:
+    return {
+        "tokens": gen.token_usage,
+        "cache": cache_manager.stats(),
+        "skus": sku_manager.stats(),
+        "catalogo": catalog_manager.stats(),
+        "jobs": job_manager.stats(),
+        "produtos_gravados": product_manager.stats(),
+        "llm": gateway.stats(),
+    }
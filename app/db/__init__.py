@@ -3,6 +3,7 @@
 from app.db.database import Base, SessionLocal, get_db
 from app.db.models import (
     Marca,
+    NotaProcessada,
     Pedido,
     PedidoItem,
     Produto,
@@ -15,6 +16,7 @@ __all__ = [
     "SessionLocal",
     "get_db",
     "Marca",
+    "NotaProcessada",
     "Pedido",
     "PedidoItem",
     "Produto",
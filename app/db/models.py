@@ -131,3 +131,14 @@ class PedidoItem(Base):
     pedido = relationship("Pedido", back_populates="itens")
     produto = relationship("Produto", back_populates="pedido_itens")
 
+
+class NotaProcessada(Base):
+    """Modelo para a tabela nota_processada (notas já somadas ao estoque)"""
+
+    __tablename__ = "nota_processada"
+
+    # Chave de acesso da NF-e ou, sem ela, o SHA-256 do conteúdo
+    chave = Column(String(64), primary_key=True)
+    marca_id = Column(PostgresUUID(as_uuid=True), ForeignKey("marca.id"))
+    itens = Column(Integer)
+    processada_em = Column(DateTime(6), default=datetime.utcnow)
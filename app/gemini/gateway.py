@@ -0,0 +1,536 @@
+"""
+LLM Gateway
+
+Ponto único de saída para o LLM, usado pela ingestão (gen.py) e pelo CRM.
+Cada chamada passa, nesta ordem, por:
+
+- circuito: depois de LLM_BREAKER_FAILURES falhas seguidas as chamadas são
+  recusadas na hora, por LLM_BREAKER_RESET_SECONDS, até uma chamada de
+  teste dar certo;
+- limite de concorrência adaptativo (AIMD): cresce aos poucos a cada
+  sucesso e cai pela metade a cada 429, 503 ou timeout. Quem passa do
+  limite espera na fila até LLM_QUEUE_TIMEOUT_SECONDS;
+- orçamento de tokens por minuto (LLM_TOKENS_PER_MINUTE, 0 desativa);
+- retentativas com backoff exponencial e jitter para erros temporários;
+- hedging opcional (chamadas com hedge): se a resposta demora mais que o
+  percentil LLM_HEDGE_PERCENTILE das latências recentes, uma cópia é
+  enviada e vale o primeiro JSON válido. Em qualquer sequência de N
+  chamadas com hedge, no máximo LLM_HEDGE_MAX_RATE * N + 1 recebem cópia
+  (0 desativa).
+
+Chamadas recusadas levantam LlmUnavailable, sem chegar ao Gemini; cabe a
+quem chama responder com um valor em cache ou degradado.
+"""
+
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager, suppress
+
+import httpx
+from google.genai import errors
+
+from app.config import (
+    LLM_BREAKER_FAILURES,
+    LLM_BREAKER_RESET_SECONDS,
+    LLM_CONCURRENCY_INITIAL,
+    LLM_CONCURRENCY_MAX,
+    LLM_HEDGE_MAX_RATE,
+    LLM_HEDGE_MIN_SAMPLES,
+    LLM_HEDGE_PERCENTILE,
+    LLM_MAX_ATTEMPTS,
+    LLM_QUEUE_TIMEOUT_SECONDS,
+    LLM_RETRY_BASE_MS,
+    LLM_RETRY_MAX_MS,
+    LLM_TOKENS_PER_MINUTE,
+)
+from app.gemini.provider import MODEL, provider
+from app.utils import json_transform
+
+logger = logging.getLogger(__name__)
+
+# Status HTTP de falhas temporárias, que valem uma nova tentativa
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+# Status que indicam sobrecarga do Gemini e reduzem a concorrência
+OVERLOAD_STATUS = {429, 503}
+# Aproximação usada para estimar os tokens do prompt antes da chamada
+CHARS_PER_TOKEN = 4
+# Quantidade de medições recentes usadas nas estatísticas
+WINDOW = 1000
+
+
+class LlmUnavailable(Exception):
+    """O gateway recusou a chamada sem enviá-la ao LLM"""
+
+
+def retryable(error: BaseException) -> bool:
+    if isinstance(error, errors.APIError):
+        return error.code in RETRYABLE_STATUS
+    return isinstance(error, (httpx.TransportError, asyncio.TimeoutError))
+
+
+def overloaded(error: BaseException) -> bool:
+    if isinstance(error, errors.APIError):
+        return error.code in OVERLOAD_STATUS
+    return isinstance(error, (httpx.TimeoutException, asyncio.TimeoutError))
+
+
+def unavailable(error: BaseException) -> bool:
+    """Erros em que vale responder com um valor em cache ou degradado"""
+    return isinstance(error, LlmUnavailable) or retryable(error)
+
+
+def valid_json(response) -> bool:
+    try:
+        json_transform.convert_json(response.text or "")
+    except ValueError:
+        return False
+    return True
+
+
+def percentile(values, q: float) -> float | None:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * q), len(ordered) - 1)]
+
+
+def hedge_delay(latencies) -> float | None:
+    """Percentil configurado das latências recentes do mesmo tipo"""
+    if len(latencies) < LLM_HEDGE_MIN_SAMPLES:
+        return None
+    return percentile(latencies, LLM_HEDGE_PERCENTILE / 100)
+
+
+class _AdaptiveLimit:
+    """Semáforo cujo tamanho segue AIMD (aumento aditivo, queda pela
+    metade)"""
+
+    def __init__(self, initial: int, maximum: int):
+        self.maximum = max(maximum, 1)
+        self.limit = float(min(max(initial, 1), self.maximum))
+        self.in_flight = 0
+        self._waiters: deque[asyncio.Future] = deque()
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self, timeout: float):
+        if not self._waiters and self.in_flight < int(self.limit):
+            self.in_flight += 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        try:
+            await asyncio.wait_for(future, timeout)
+        except BaseException:
+            if future.done() and not future.cancelled():
+                # A vaga chegou junto com o timeout: repassa para o próximo
+                self.release()
+            else:
+                with suppress(ValueError):
+                    self._waiters.remove(future)
+            raise
+
+    def release(self):
+        self.in_flight -= 1
+        self._wake()
+
+    def increase(self):
+        self.limit = min(self.limit + 1 / self.limit, self.maximum)
+        self._wake()
+
+    def decrease(self):
+        self.limit = max(self.limit / 2, 1.0)
+
+    def _wake(self):
+        while self._waiters and self.in_flight < int(self.limit):
+            future = self._waiters.popleft()
+            if not future.done():
+                self.in_flight += 1
+                future.set_result(None)
+
+
+class _TokenBucket:
+    """Orçamento de tokens por minuto; com 0 não há limite"""
+
+    def __init__(self, per_minute: int):
+        self.capacity = per_minute
+        self.tokens = float(per_minute)
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        rate = self.capacity / 60
+        self.tokens = min(
+            self.tokens + (now - self._updated) * rate, self.capacity
+        )
+        self._updated = now
+
+    async def take(self, amount: int, deadline: float):
+        if not self.capacity:
+            return
+
+        amount = min(amount, self.capacity)
+        while True:
+            self._refill()
+            if self.tokens >= amount:
+                self.tokens -= amount
+                return
+
+            wait = (amount - self.tokens) / (self.capacity / 60)
+            if time.monotonic() + wait > deadline:
+                raise LlmUnavailable("Orçamento de tokens do LLM esgotado")
+            await asyncio.sleep(wait)
+
+    def adjust(self, amount: int):
+        """Debita (ou devolve) a diferença entre o consumo real e o
+        estimado"""
+        if self.capacity:
+            self._refill()
+            self.tokens = min(self.tokens - amount, self.capacity)
+
+
+class _CircuitBreaker:
+    CLOSED = "fechado"
+    OPEN = "aberto"
+    HALF_OPEN = "meio_aberto"
+
+    def __init__(self, failures: int, reset_seconds: int):
+        self.threshold = max(failures, 1)
+        self.reset_seconds = reset_seconds
+        self.state = self.CLOSED
+        self.failures = 0
+        self.openings = 0
+        self._opened_at = 0.0
+        self._probing = False
+
+    def allow(self) -> bool:
+        if self.state == self.CLOSED:
+            return True
+
+        elapsed = time.monotonic() - self._opened_at
+        if self.state == self.OPEN and elapsed >= self.reset_seconds:
+            self.state = self.HALF_OPEN
+
+        # Meio aberto: apenas uma chamada de teste por vez
+        if self.state == self.HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+
+        return False
+
+    def record(self, success: bool | None):
+        """Resultado da chamada: sucesso, falha ou None (não conta)"""
+        self._probing = False
+
+        if success:
+            self.failures = 0
+            self.state = self.CLOSED
+        elif success is False:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.threshold:
+                self._open()
+
+    def _open(self):
+        if self.state != self.OPEN:
+            self.openings += 1
+            logger.warning(
+                "Circuito do LLM aberto após %d falhas seguidas",
+                self.failures,
+            )
+        self.state = self.OPEN
+        self._opened_at = time.monotonic()
+
+
+class LlmGateway:
+    def __init__(self):
+        self.limit = _AdaptiveLimit(
+            LLM_CONCURRENCY_INITIAL, LLM_CONCURRENCY_MAX
+        )
+        self.budget = _TokenBucket(LLM_TOKENS_PER_MINUTE)
+        self.breaker = _CircuitBreaker(
+            LLM_BREAKER_FAILURES, LLM_BREAKER_RESET_SECONDS
+        )
+        self.queue_timeout = LLM_QUEUE_TIMEOUT_SECONDS
+        self.attempts = max(LLM_MAX_ATTEMPTS, 1)
+        self.calls = 0
+        self.failures = 0
+        self.retries = 0
+        self.rejected = {"circuito": 0, "fila": 0, "tokens": 0}
+        self._waits: deque[float] = deque(maxlen=WINDOW)
+        self._latencies: deque[float] = deque(maxlen=WINDOW)
+        self.hedge_rate = LLM_HEDGE_MAX_RATE
+        self.hedges = 0
+        self.hedge_wins = 0
+        # Crédito para cópias: cada chamada com hedge rende hedge_rate e
+        # cada cópia gasta 1, com no máximo uma cópia acumulada
+        self._hedge_credit = 0.0
+        # Se cada chamada com hedge recente recebeu cópia
+        self._hedged: deque[bool] = deque(maxlen=WINDOW)
+        # Latência recente por tipo de chamada (o hedge informado)
+        self._hedge_latencies: dict[str, deque[float]] = {}
+
+    async def generate(
+        self,
+        contents: str,
+        config: dict | None = None,
+        hedge: str | None = None,
+    ):
+        """
+        generate_content com circuito, limite, orçamento e retentativas.
+        Com hedge (nome do tipo de chamada, ex.: o arquivo do prompt), a
+        chamada pode receber uma cópia quando demora mais que as recentes
+        do mesmo tipo.
+        """
+        self._admit()
+        estimate = len(contents) // CHARS_PER_TOKEN
+        success = None
+
+        try:
+            if hedge and self.hedge_rate > 0:
+                response = await self._race(contents, config, estimate, hedge)
+            else:
+                response = await self._retry(contents, config, estimate)
+            success = True
+        except LlmUnavailable:
+            raise
+        except Exception as e:
+            # Erro da própria chamada (ex.: 400) não diz nada sobre o LLM
+            success = False if retryable(e) else None
+            raise
+        finally:
+            self._finish(success)
+
+        self._charge(response, estimate)
+        return response
+
+    async def stream(
+        self, contents: str, config: dict | None = None
+    ) -> AsyncIterator:
+        """
+        generate_content_stream com circuito, limite e orçamento. Não há
+        retentativa: parte do texto pode já ter sido repassada ao cliente.
+        """
+        self._admit()
+        estimate = len(contents) // CHARS_PER_TOKEN
+        success = None
+        chunk = None
+
+        try:
+            async with self._slot(estimate):
+                models = provider.get().aio.models
+                stream = await models.generate_content_stream(
+                    model=MODEL, contents=contents, config=config
+                )
+                async for chunk in stream:
+                    yield chunk
+            success = True
+        except LlmUnavailable:
+            raise
+        except Exception as e:
+            # Erro da própria chamada (ex.: 400) não diz nada sobre o LLM
+            success = False if retryable(e) else None
+            raise
+        finally:
+            self._finish(success)
+
+        self._charge(chunk, estimate)
+
+    def stats(self) -> dict:
+        waits = [wait * 1000 for wait in self._waits]
+        latencies = [latency * 1000 for latency in self._latencies]
+
+        return {
+            "chamadas": self.calls,
+            "falhas": self.failures,
+            "retentativas": self.retries,
+            "rejeitadas": dict(self.rejected),
+            "limite_concorrencia": round(self.limit.limit, 2),
+            "em_andamento": self.limit.in_flight,
+            "na_fila": self.limit.waiting,
+            "espera_fila_ms": {
+                "media": sum(waits) / len(waits) if waits else None,
+                "p95": percentile(waits, 0.95),
+                "max": max(waits, default=None),
+            },
+            "latencia_ms": {
+                "p50": percentile(latencies, 0.5),
+                "p99": percentile(latencies, 0.99),
+            },
+            "hedging": {
+                "copias": self.hedges,
+                "vitorias_copia": self.hedge_wins,
+                "taxa_recente": (
+                    sum(self._hedged) / len(self._hedged)
+                    if self._hedged
+                    else None
+                ),
+                "atraso_ms": {
+                    key: delay * 1000
+                    for key, latencies in self._hedge_latencies.items()
+                    if (delay := hedge_delay(latencies)) is not None
+                },
+            },
+            "circuito": {
+                "estado": self.breaker.state,
+                "falhas_seguidas": self.breaker.failures,
+                "aberturas": self.breaker.openings,
+            },
+            "tokens_disponiveis": (
+                round(self.budget.tokens) if self.budget.capacity else None
+            ),
+        }
+
+    def _admit(self):
+        if not self.breaker.allow():
+            self.rejected["circuito"] += 1
+            raise LlmUnavailable(
+                "Serviço de IA indisponível no momento (circuito aberto)"
+            )
+        self.calls += 1
+
+    def _finish(self, success: bool | None):
+        if success is False:
+            self.failures += 1
+        self.breaker.record(success)
+
+    def _charge(self, response, estimate: int):
+        usage = getattr(response, "usage_metadata", None)
+        if usage is not None:
+            used = (usage.prompt_token_count or 0) + (
+                usage.candidates_token_count or 0
+            )
+            self.budget.adjust(used - estimate)
+
+    @asynccontextmanager
+    async def _slot(self, estimate: int):
+        """Vaga no limite de concorrência e tokens do orçamento"""
+        queued = time.monotonic()
+
+        try:
+            await self.limit.acquire(self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected["fila"] += 1
+            raise LlmUnavailable(
+                "Fila de chamadas ao LLM cheia, tente novamente mais tarde"
+            ) from None
+
+        try:
+            await self.budget.take(estimate, queued + self.queue_timeout)
+        except BaseException as e:
+            if isinstance(e, LlmUnavailable):
+                self.rejected["tokens"] += 1
+            self.limit.release()
+            raise
+
+        started = time.monotonic()
+        self._waits.append(started - queued)
+
+        try:
+            yield
+        except Exception as e:
+            if overloaded(e):
+                self.limit.decrease()
+            raise
+        finally:
+            self.limit.release()
+
+        self._latencies.append(time.monotonic() - started)
+        self.limit.increase()
+
+    def _may_hedge(self) -> bool:
+        # Sem cópias com o Gemini sobrecarregado ou sem crédito: chamadas
+        # sem cópia não viram uma rajada de cópias depois
+        if self.limit.waiting or self._hedge_credit < 1:
+            return False
+
+        self._hedge_credit -= 1
+        return True
+
+    async def _race(
+        self, contents: str, config: dict | None, estimate: int, key: str
+    ):
+        """
+        Envia a chamada e, se ela passar do atraso de hedge, uma cópia.
+        Vale a primeira resposta com JSON válido; a outra é cancelada.
+        """
+        latencies = self._hedge_latencies.setdefault(key, deque(maxlen=WINDOW))
+        delay = hedge_delay(latencies)
+        started = {}
+        self._hedge_credit = min(self._hedge_credit + self.hedge_rate, 1.0)
+
+        def launch() -> asyncio.Task:
+            task = asyncio.create_task(self._retry(contents, config, estimate))
+            started[task] = time.monotonic()
+            return task
+
+        primary = launch()
+        pending = {primary}
+        hedged = False
+        error = invalid = None
+
+        try:
+            if delay is not None:
+                done, _ = await asyncio.wait(pending, timeout=delay)
+                if not done and self._may_hedge():
+                    hedged = True
+                    self.hedges += 1
+                    pending.add(launch())
+
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is not None:
+                        error = error or task.exception()
+                    elif valid_json(task.result()):
+                        latencies.append(time.monotonic() - started[task])
+                        if task is not primary:
+                            self.hedge_wins += 1
+                        return task.result()
+                    else:
+                        invalid = invalid or task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+            # Espera a chamada cancelada liberar a vaga no limite
+            await asyncio.gather(*pending, return_exceptions=True)
+            self._hedged.append(hedged)
+
+        # Nenhum JSON válido: devolve a resposta para quem chamou tratar
+        if invalid is not None:
+            return invalid
+        raise error
+
+    async def _retry(self, contents: str, config: dict | None, estimate: int):
+        for attempt in range(self.attempts):
+            try:
+                async with self._slot(estimate):
+                    return await provider.get().aio.models.generate_content(
+                        model=MODEL, contents=contents, config=config
+                    )
+            except Exception as e:
+                if not retryable(e) or attempt + 1 >= self.attempts:
+                    raise
+
+                # Backoff exponencial com jitter completo
+                delay = random.uniform(
+                    0, min(LLM_RETRY_MAX_MS, LLM_RETRY_BASE_MS * 2**attempt)
+                )
+                self.retries += 1
+                logger.warning(
+                    "Falha temporária no LLM (%s), nova tentativa em %d ms",
+                    e,
+                    delay,
+                )
+                await asyncio.sleep(delay / 1000)
+
+
+gateway = LlmGateway()
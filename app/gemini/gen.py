@@ -1,29 +1,103 @@
+import hashlib
+import logging
+from functools import cache
+
 from fastapi import HTTPException, status
-from google import genai
 
-from app.config import GEMINI_API_KEY
+from app.gemini.gateway import gateway, unavailable
 from app.manager.path_manager import PathManager
 from app.utils import json_transform
+from app.utils.pdf_transform import transform_products
+
+logger = logging.getLogger(__name__)
 
 path_manager = PathManager()
 
-client = genai.Client(api_key=GEMINI_API_KEY)
+# Consumo de tokens acumulado desde o início do processo
+token_usage = {
+    "requisicoes": 0,
+    "prompt_tokens": 0,
+    "resposta_tokens": 0,
+    "ultima_requisicao": None,
+}
+
+
+@cache
+def _prompt() -> str:
+    """
+    Prompt lido uma única vez: alterações no arquivo valem após reiniciar
+    a API, mantendo o texto enviado e a versão do cache consistentes.
+    """
+    return path_manager.read_path(path_manager.path_prompt)
+
+
+@cache
+def prompt_version() -> str:
+    """Hash do prompt atual, usado para invalidar resultados em cache"""
+    return hashlib.sha256(_prompt().encode("utf-8")).hexdigest()
+
 
+def _record_usage(response, items: int):
+    usage = response.usage_metadata
+    prompt_tokens = (usage and usage.prompt_token_count) or 0
+    output_tokens = (usage and usage.candidates_token_count) or 0
+
+    token_usage["requisicoes"] += 1
+    token_usage["prompt_tokens"] += prompt_tokens
+    token_usage["resposta_tokens"] += output_tokens
+    token_usage["ultima_requisicao"] = {
+        "itens": items,
+        "prompt_tokens": prompt_tokens,
+        "resposta_tokens": output_tokens,
+    }
+
+    logger.info(
+        "Gemini: %d itens, %d tokens no prompt, %d tokens na resposta",
+        items,
+        prompt_tokens,
+        output_tokens,
+    )
+
+
+async def gen_names(
+    products: list[dict], brand: str, columns: tuple[str, ...] = ("sku",)
+) -> dict[str, str]:
+    """
+    Pede ao Gemini o nome real dos produtos, identificados pelo SKU. Apenas
+    as colunas informadas (sem repetição) são enviadas no prompt. Com o
+    LLM indisponível (chamada recusada pelo gateway ou erro temporário
+    que persistiu após as retentativas), o erro é repassado a quem chamou.
+    """
+    if not products:
+        return {}
 
-def gen_json():
     try:
-        prompt_content = path_manager.read_path(path_manager.path_prompt)
-        product_content = path_manager.read_path(path_manager.path_product)
+        prompt_content = _prompt().replace("{marca}", brand)
+        product_content = transform_products(products, columns)
 
-        response = client.models.generate_content(
-            model="gemini-2.0-flash",
-            contents=f"{prompt_content}:\n\n{product_content}",
+        response = await gateway.generate(
+            f"{prompt_content}\n\n{product_content}",
+            config={"response_mime_type": "application/json"},
         )
 
+        _record_usage(response, product_content.count("\n"))
         return json_transform.convert_json(response.text)
 
     except Exception as e:
+        if unavailable(e):
+            raise
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"{str(e)}",
         )
+
+
+def apply_names(products: list[dict], names: dict[str, str]) -> list[dict]:
+    """Usa o nome encontrado como nome e descrição de cada produto"""
+    for product in products:
+        name = names.get(product["sku"])
+        if name:
+            product["nome"] = name
+            product["descricao"] = name
+
+    return products
@@ -0,0 +1,94 @@
+"""Gemini Client Provider"""
+
+import httpx
+from google import genai
+from google.genai import types
+
+from app.config import (
+    GEMINI_API_KEY,
+    GEMINI_KEEPALIVE_SECONDS,
+    GEMINI_MAX_CONNECTIONS,
+    GEMINI_MAX_KEEPALIVE,
+    GEMINI_MODEL,
+    GEMINI_TIMEOUT_SECONDS,
+    LLM_PROVIDER,
+    LLM_STUB_ERROR_CODE,
+    LLM_STUB_ERROR_RATE,
+    LLM_STUB_JITTER_MS,
+    LLM_STUB_LATENCY_MS,
+)
+from app.gemini.stub import StubClient
+
+MODEL = GEMINI_MODEL
+
+
+def http_options() -> types.HttpOptions:
+    """Timeout e pool de conexões HTTP usados pelo cliente async"""
+    # async_client_args é repassado ao httpx.AsyncClient (google-genai 1.11+)
+    return types.HttpOptions(
+        timeout=GEMINI_TIMEOUT_SECONDS * 1000,
+        async_client_args={
+            "limits": httpx.Limits(
+                max_connections=GEMINI_MAX_CONNECTIONS,
+                max_keepalive_connections=GEMINI_MAX_KEEPALIVE,
+                keepalive_expiry=GEMINI_KEEPALIVE_SECONDS,
+            )
+        },
+    )
+
+
+def _gemini() -> genai.Client:
+    return genai.Client(api_key=GEMINI_API_KEY, http_options=http_options())
+
+
+def _stub() -> StubClient:
+    return StubClient(
+        latency=LLM_STUB_LATENCY_MS / 1000,
+        jitter=LLM_STUB_JITTER_MS / 1000,
+        error_rate=LLM_STUB_ERROR_RATE,
+        error_code=LLM_STUB_ERROR_CODE,
+    )
+
+
+# Clientes disponíveis, escolhidos por LLM_PROVIDER
+PROVIDERS = {
+    "gemini": _gemini,
+    "stub": _stub,
+}
+
+
+class ClientProvider:
+    """
+    Um único cliente do LLM por processo, criado no primeiro uso a partir
+    de LLM_PROVIDER. As conexões (e o handshake TLS) são reaproveitadas
+    por todas as chamadas da ingestão e do CRM.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._client = None
+
+    def get(self) -> genai.Client | StubClient:
+        if self._client is None:
+            factory = PROVIDERS.get(self.name)
+            if factory is None:
+                raise ValueError(
+                    f"LLM_PROVIDER {self.name} inválido, use: "
+                    f"{', '.join(PROVIDERS)}"
+                )
+            self._client = factory()
+
+        return self._client
+
+    def set(self, client):
+        """Troca o cliente usado por todas as chamadas (ex.: benchmark)"""
+        self._client = client
+
+    async def aclose(self):
+        aclose = getattr(getattr(self._client, "aio", None), "aclose", None)
+        if aclose:
+            await aclose()
+        self._client = None
+
+
+provider = ClientProvider(LLM_PROVIDER)
@@ -0,0 +1,148 @@
+"""
+Stub LLM Client
+
+Substitui o Gemini em testes de carga locais (LLM_PROVIDER=stub). Expõe a
+mesma interface usada pela API (client.aio.models.generate_content e
+generate_content_stream) e responde sem acessar a rede:
+
+- prompts de nomes de produtos: um nome para cada SKU da tabela enviada;
+- demais prompts: o exemplo de JSON do próprio prompt, preenchido.
+"""
+
+import asyncio
+import json
+import random
+import re
+from datetime import date
+
+from google.genai import errors
+
+# Primeira linha "{" até a próxima linha "}": exemplo de resposta do prompt
+TEMPLATE = re.compile(r"^\{$.*?^\}$", re.MULTILINE | re.DOTALL)
+# Valores enumerados no exemplo, como "ALTA|MEDIA|BAIXA"
+CHOICES = re.compile(r"^[A-Z_]+(\|[A-Z_]+)+$")
+
+PLACEHOLDERS = {"uuid": "00000000-0000-0000-0000-000000000000"}
+
+# Status HTTP a partir do qual o erro simulado é um ServerError
+SERVER_ERROR = 500
+STATUS = {429: "RESOURCE_EXHAUSTED", 500: "INTERNAL", 503: "UNAVAILABLE"}
+
+
+def _fill_text(value: str) -> str:
+    if CHOICES.match(value):
+        return value.split("|", maxsplit=1)[0]
+    if value == "YYYY-MM-DD":
+        return date.today().isoformat()
+    return PLACEHOLDERS.get(value, "Resposta simulada")
+
+
+def _fill(value):
+    """Troca os marcadores do exemplo por valores do tipo esperado"""
+    if isinstance(value, dict):
+        return {key: _fill(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_fill(item) for item in value]
+    if isinstance(value, str):
+        return _fill_text(value)
+    return value
+
+
+def render(contents: str) -> str:
+    """Resposta em JSON compatível com o formato pedido no prompt"""
+    table = contents.rsplit("\n\n", 1)[-1].splitlines()
+    if table and table[0].split("\t")[0] == "sku":
+        skus = (line.split("\t", 1)[0] for line in table[1:] if line)
+        return json.dumps(
+            {sku: sku.replace("-", " ").title() for sku in skus},
+            ensure_ascii=False,
+        )
+
+    match = TEMPLATE.search(contents)
+    try:
+        template = json.loads(match.group()) if match else {}
+    except ValueError:
+        template = {}
+
+    return json.dumps(_fill(template), ensure_ascii=False)
+
+
+class _Usage:
+    def __init__(self, prompt: str, text: str):
+        self.prompt_token_count = len(prompt) // 4
+        self.candidates_token_count = len(text) // 4
+
+
+class _Response:
+    def __init__(self, text: str, prompt: str):
+        self.text = text
+        self.usage_metadata = _Usage(prompt, text)
+
+
+class _Models:
+    def __init__(
+        self, latency: float, jitter: float, error_rate: float, error_code: int
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_code = error_code
+
+    async def _wait(self, share: float = 1.0):
+        delay = self.latency + random.uniform(-self.jitter, self.jitter)
+        await asyncio.sleep(max(delay, 0) * share)
+
+    def _maybe_fail(self):
+        if random.random() >= self.error_rate:
+            return
+
+        body = {
+            "error": {
+                "code": self.error_code,
+                "message": "Erro simulado pelo stub",
+                "status": STATUS.get(self.error_code, "UNKNOWN"),
+            }
+        }
+        if self.error_code >= SERVER_ERROR:
+            raise errors.ServerError(self.error_code, body)
+        raise errors.ClientError(self.error_code, body)
+
+    async def generate_content(self, model, contents, config=None):
+        await self._wait()
+        self._maybe_fail()
+
+        return _Response(render(contents), contents)
+
+    async def generate_content_stream(self, model, contents, config=None):
+        self._maybe_fail()
+        text = render(contents)
+        size = max(len(text) // 4, 1)
+        parts = [text[i : i + size] for i in range(0, len(text), size)]
+
+        async def stream():
+            for part in parts:
+                await self._wait(1 / len(parts))
+                yield _Response(part, contents)
+
+        return stream()
+
+
+class StubClient:
+    """
+    Cliente local com latência (segundos, ± jitter) e taxa de erros
+    configuráveis. Os erros simulados usam as mesmas exceções do SDK do
+    Gemini (ServerError para 5xx, ClientError para 4xx, como o 429).
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        error_code: int = 503,
+    ):
+        self.aio = type(
+            "AsyncStub",
+            (),
+            {"models": _Models(latency, jitter, error_rate, error_code)},
+        )()
@@ -0,0 +1,164 @@
+"""CacheManager"""
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from fastapi.concurrency import run_in_threadpool
+
+
+class CacheManager:
+    """
+    Cache de resultados em dois níveis: LRU em memória e, opcionalmente,
+    arquivos em disco que sobrevivem a reinícios. Ambos são limitados
+    pelo tamanho total em bytes dos valores serializados.
+
+    O acesso ao disco roda no threadpool. Os arquivos são indexados uma
+    única vez na inicialização e, a partir daí, o total em disco é mantido
+    a cada escrita e remoção, sem varrer a pasta.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int,
+        disk_path: str | None = None,
+        disk_max_bytes: int = 0,
+    ):
+        self.max_bytes = max_bytes
+        self.disk_path = disk_path
+        self.disk_max_bytes = disk_max_bytes
+        self.size = 0
+        self.disk_size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, bytes] = OrderedDict()
+        # Tamanho de cada arquivo em disco, do menos para o mais usado
+        self._disk: OrderedDict[str, int] = OrderedDict()
+        self._disk_lock = threading.Lock()
+
+        if self.disk_path:
+            os.makedirs(self.disk_path, exist_ok=True)
+            self._index_disk()
+
+    @staticmethod
+    def key(*parts: str | bytes) -> str:
+        digest = hashlib.sha256()
+        for part in parts:
+            data = part.encode("utf-8") if isinstance(part, str) else part
+            # O tamanho evita colisões entre partes concatenadas
+            digest.update(len(data).to_bytes(8, "big"))
+            digest.update(data)
+        return digest.hexdigest()
+
+    async def get(self, key: str):
+        data = self._entries.get(key)
+
+        if data is not None:
+            self._entries.move_to_end(key)
+        elif self.disk_path:
+            data = await run_in_threadpool(self._read_disk, key)
+            if data is not None:
+                self._store_memory(key, data)
+
+        if data is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return json.loads(data)
+
+    async def set(self, key: str, value):
+        data = json.dumps(value, ensure_ascii=False).encode("utf-8")
+
+        self._store_memory(key, data)
+        if self.disk_path:
+            await run_in_threadpool(self._write_disk, key, data)
+
+    def stats(self) -> dict:
+        return {
+            "itens": len(self._entries),
+            "bytes": self.size,
+            "limite_bytes": self.max_bytes,
+            "acertos": self.hits,
+            "falhas": self.misses,
+            "disco": bool(self.disk_path),
+            "disco_itens": len(self._disk),
+            "disco_bytes": self.disk_size,
+        }
+
+    def _store_memory(self, key: str, data: bytes):
+        if len(data) > self.max_bytes:
+            return
+
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.size -= len(old)
+
+        self._entries[key] = data
+        self.size += len(data)
+
+        while self.size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= len(evicted)
+
+    def _disk_file(self, key: str) -> str:
+        return os.path.join(self.disk_path, f"{key}.json")
+
+    def _index_disk(self):
+        """Indexa os arquivos existentes, dos mais antigos aos mais novos"""
+        files = []
+        with os.scandir(self.disk_path) as entries:
+            for entry in entries:
+                if entry.name.endswith(".json"):
+                    stat = entry.stat()
+                    files.append(
+                        (stat.st_mtime, entry.name[:-5], stat.st_size)
+                    )
+
+        for _, key, size in sorted(files):
+            self._disk[key] = size
+            self.disk_size += size
+
+        self._evict_disk()
+
+    def _read_disk(self, key: str) -> bytes | None:
+        path = self._disk_file(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            # Atualiza o mtime para a ordem de uso sobreviver a reinícios
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+
+        with self._disk_lock:
+            if key in self._disk:
+                self._disk.move_to_end(key)
+
+        return data
+
+    def _write_disk(self, key: str, data: bytes):
+        if len(data) > self.disk_max_bytes:
+            return
+
+        path = self._disk_file(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        with self._disk_lock:
+            self.disk_size += len(data) - self._disk.pop(key, 0)
+            self._disk[key] = len(data)
+            self._evict_disk()
+
+    def _evict_disk(self):
+        while self.disk_size > self.disk_max_bytes and self._disk:
+            key, size = self._disk.popitem(last=False)
+            self.disk_size -= size
+            try:
+                os.remove(self._disk_file(key))
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,335 @@
+"""CatalogManager"""
+
+import asyncio
+import logging
+import re
+import time
+
+import numpy as np
+from fastapi.concurrency import run_in_threadpool
+
+from app.db.database import SessionLocal
+from app.db.models import Marca, Produto
+from app.utils.pdf_transform import slugify
+
+logger = logging.getLogger(__name__)
+
+# Candidatos com maior pontuação conferidos pelos números da descrição
+CANDIDATES = 5
+NUMBERS = re.compile(r"\d+")
+
+
+def trigrams(text: str) -> set[str]:
+    """Trigramas do texto normalizado (minúsculas, sem acentos)"""
+    text = f"  {slugify(text).replace('-', ' ')} "
+    return {text[i : i + 3] for i in range(len(text) - 2)}
+
+
+class _Snapshot:
+    """
+    Estado do índice de uma marca em um instante: os produtos, o índice de
+    trigramas e a versão compacta em arrays numpy usada nas consultas.
+    Nunca é alterado depois de montado; cada atualização monta um novo.
+    """
+
+    def __init__(
+        self, products: dict, index: dict[str, frozenset], last_updated
+    ):
+        self.products = products
+        self.index = index
+        self.last_updated = last_updated
+
+        positions = {
+            product_id: position
+            for position, product_id in enumerate(products)
+        }
+
+        self.names = [product["nome"] for product in products.values()]
+        self.numbers = [set(NUMBERS.findall(name)) for name in self.names]
+        self.sizes = np.array(
+            [len(product["grams"]) for product in products.values()],
+            dtype=np.float64,
+        )
+        self.postings = {
+            gram: np.fromiter(
+                (positions[product_id] for product_id in ids),
+                dtype=np.int32,
+                count=len(ids),
+            )
+            for gram, ids in index.items()
+        }
+
+    def updated(self, rows: list, removed=()) -> "_Snapshot":
+        """
+        Novo estado com os produtos alterados e sem os removidos (que
+        passaram para outra marca), sem tocar neste
+        """
+        products = dict(self.products)
+        index = dict(self.index)
+        last_updated = self.last_updated
+        # Trigramas alterados, copiados uma única vez da versão anterior
+        touched: dict[str, set] = {}
+
+        def ids(gram: str) -> set:
+            if gram not in touched:
+                touched[gram] = set(index.get(gram, ()))
+            return touched[gram]
+
+        for product_id in removed:
+            old = products.pop(product_id, None)
+            if old is not None:
+                for gram in old["grams"]:
+                    ids(gram).discard(product_id)
+
+        for row in rows:
+            old = products.pop(row.id, None)
+            if old is not None:
+                for gram in old["grams"]:
+                    ids(gram).discard(row.id)
+
+            grams = trigrams(row.nome)
+            products[row.id] = {"nome": row.nome, "grams": grams}
+            for gram in grams:
+                ids(gram).add(row.id)
+
+            if row.atualizado_em and (
+                last_updated is None or row.atualizado_em > last_updated
+            ):
+                last_updated = row.atualizado_em
+
+        for gram, members in touched.items():
+            if members:
+                index[gram] = frozenset(members)
+            else:
+                index.pop(gram, None)
+
+        return _Snapshot(products, index, last_updated)
+
+
+EMPTY = _Snapshot({}, {}, None)
+
+
+class _Catalog:
+    """Índices por marca (marca_id) e as marcas, da mais antiga à mais nova"""
+
+    def __init__(self, snapshots: dict, brands: list):
+        self.snapshots = snapshots
+        self.brands = brands
+
+    @property
+    def last_updated(self):
+        return max(
+            (
+                snapshot.last_updated
+                for snapshot in self.snapshots.values()
+                if snapshot.last_updated is not None
+            ),
+            default=None,
+        )
+
+    def snapshot(self, brand: str) -> _Snapshot | None:
+        """
+        Índice da marca encontrada pelo nome como na gravação dos produtos:
+        a mais antiga cujo nome contém o informado
+        """
+        brand = brand.casefold()
+        for brand_id, name in self.brands:
+            if brand in name.casefold():
+                return self.snapshots.get(brand_id)
+        return None
+
+    def updated(self, rows: list, brands: list) -> "_Catalog":
+        """Novo catálogo com os produtos alterados, sem tocar neste"""
+        grouped: dict = {}
+        for row in rows:
+            grouped.setdefault(row.marca_id, []).append(row)
+
+        snapshots = dict(self.snapshots)
+        for brand_id, snapshot in self.snapshots.items():
+            # Produtos que passaram desta marca para outra
+            moved = [
+                row.id
+                for row in rows
+                if row.marca_id != brand_id and row.id in snapshot.products
+            ]
+            if moved or brand_id in grouped:
+                snapshots[brand_id] = snapshot.updated(
+                    grouped.pop(brand_id, []), moved
+                )
+
+        for brand_id, group in grouped.items():
+            snapshots[brand_id] = EMPTY.updated(group)
+
+        return _Catalog(snapshots, brands)
+
+
+class CatalogManager:
+    """
+    Índice de trigramas em memória sobre o catálogo (tabela produto) para
+    associar descrições de notas fiscais a produtos já cadastrados. Há um
+    índice por marca: a descrição só é comparada com produtos da marca da
+    nota.
+
+    O índice é montado na inicialização e atualizado de forma incremental
+    pela coluna atualizado_em. Produtos removidos do banco só saem do
+    índice quando o processo reinicia.
+
+    Cada atualização monta um novo estado no threadpool e o troca em uma
+    única atribuição, então as consultas nunca veem um índice pela
+    metade. Uma atualização por vez: quem chega durante uma atualização
+    espera por ela em vez de repeti-la. As consultas também rodam no
+    threadpool, sem bloquear o event loop.
+    """
+
+    def __init__(self, refresh_interval: int):
+        self.refresh_interval = refresh_interval
+        self.last_refresh = 0.0
+        self.lookups = 0
+        self.matches = 0
+        self._catalog = _Catalog({}, [])
+        self._refresh_lock = asyncio.Lock()
+
+    async def refresh(self):
+        async with self._refresh_lock:
+            await self._refresh()
+
+    async def ensure_fresh(self):
+        if not self._stale():
+            return
+
+        async with self._refresh_lock:
+            # Outra requisição pode ter atualizado enquanto esta esperava
+            if self._stale():
+                await self._refresh()
+
+    async def match(
+        self, brand: str, description: str
+    ) -> tuple[str, float] | None:
+        """Produto da marca mais parecido e a confiança (0 a 1)"""
+        return (await self.match_many(brand, [description]))[0]
+
+    async def match_many(
+        self, brand: str, descriptions: list[str]
+    ) -> list[tuple[str, float] | None]:
+        """
+        Consulta várias descrições da marca de uma vez; descrições
+        repetidas são avaliadas uma única vez.
+        """
+        snapshot = self._catalog.snapshot(brand)
+
+        if snapshot is None:
+            results = [None] * len(descriptions)
+        else:
+            results = await run_in_threadpool(
+                self._match_all, snapshot, descriptions
+            )
+
+        self.lookups += len(descriptions)
+        self.matches += sum(1 for result in results if result)
+
+        return results
+
+    @classmethod
+    def _match_all(
+        cls, snapshot: _Snapshot, descriptions: list[str]
+    ) -> list[tuple[str, float] | None]:
+        unique = {}
+        for description in descriptions:
+            if description not in unique:
+                unique[description] = cls._match(snapshot, description)
+
+        return [unique[description] for description in descriptions]
+
+    @staticmethod
+    def _match(
+        snapshot: _Snapshot, description: str
+    ) -> tuple[str, float] | None:
+        grams = trigrams(description)
+        postings = [
+            snapshot.postings[gram]
+            for gram in grams
+            if gram in snapshot.postings
+        ]
+
+        if not postings or not snapshot.names:
+            return None
+
+        # Trigramas em comum com cada produto, contados de uma só vez
+        shared = np.bincount(
+            np.concatenate(postings), minlength=len(snapshot.names)
+        )
+
+        # Coeficiente de Dice entre os conjuntos de trigramas
+        scores = 2 * shared / (len(grams) + snapshot.sizes)
+
+        size = min(CANDIDATES, len(scores))
+        top = np.argpartition(scores, -size)[-size:]
+        top = [
+            int(position)
+            for position in top[np.argsort(scores[top])[::-1]]
+            if shared[position]
+        ]
+        if not top:
+            return None
+
+        # Volumes e quantidades ("90ML", "KIT 3") precisam bater; um
+        # produto com números diferentes tem a confiança reduzida à metade
+        numbers = set(NUMBERS.findall(description))
+        for position in top:
+            if snapshot.numbers[position] == numbers:
+                return snapshot.names[position], float(scores[position])
+
+        return snapshot.names[top[0]], float(scores[top[0]]) / 2
+
+    def stats(self) -> dict:
+        snapshots = self._catalog.snapshots.values()
+        return {
+            "marcas": len(snapshots),
+            "produtos": sum(len(snapshot.products) for snapshot in snapshots),
+            "trigramas": sum(len(snapshot.index) for snapshot in snapshots),
+            "consultas": self.lookups,
+            "encontrados": self.matches,
+        }
+
+    def _stale(self) -> bool:
+        return time.monotonic() - self.last_refresh >= self.refresh_interval
+
+    async def _refresh(self):
+        try:
+            catalog = await run_in_threadpool(self._build, self._catalog)
+            if catalog is not None:
+                self._catalog = catalog
+        except Exception as e:
+            logger.warning("Falha ao atualizar o índice do catálogo: %s", e)
+        finally:
+            self.last_refresh = time.monotonic()
+
+    @staticmethod
+    def _build(catalog: _Catalog) -> _Catalog | None:
+        """Novo estado com as alterações do banco, ou None se não houver"""
+        last_updated = catalog.last_updated
+
+        with SessionLocal() as db:
+            brands = [
+                (row.id, row.nome)
+                for row in db.query(Marca.id, Marca.nome).order_by(
+                    Marca.criado_em
+                )
+            ]
+
+            query = db.query(
+                Produto.id,
+                Produto.nome,
+                Produto.marca_id,
+                Produto.atualizado_em,
+            ).filter(Produto.nome.isnot(None), Produto.marca_id.isnot(None))
+
+            if last_updated is not None:
+                query = query.filter(Produto.atualizado_em > last_updated)
+
+            rows = query.all()
+
+        if not rows and brands == catalog.brands:
+            return None
+
+        return catalog.updated(rows, brands)
@@ -0,0 +1,93 @@
+"""FlightManager"""
+
+import asyncio
+from collections.abc import AsyncIterator, Awaitable, Callable
+from functools import partial
+
+Publish = Callable[[object], None]
+
+
+class _Flight:
+    """Execução em andamento e os eventos que ela já publicou"""
+
+    def __init__(self):
+        self.events = []
+        self.task: asyncio.Task | None = None
+        self._signal = asyncio.Event()
+
+    def publish(self, event):
+        self.events.append(event)
+        self.notify()
+
+    def notify(self, *_):
+        # Acorda quem espera e deixa um sinal novo para a próxima espera
+        self._signal.set()
+        self._signal = asyncio.Event()
+
+    async def changed(self):
+        await self._signal.wait()
+
+
+class FlightManager:
+    """
+    Single-flight: chamadas simultâneas com a mesma chave compartilham uma
+    única execução e recebem o mesmo resultado (ou a mesma exceção).
+
+    A execução roda em uma task própria, então o cancelamento de uma das
+    requisições que aguardam não interrompe as demais. Ela recebe uma
+    função para publicar eventos parciais: quem assina a execução recebe
+    os já publicados e, em seguida, os próximos, na mesma ordem.
+    """
+
+    def __init__(self):
+        self.leaders = 0
+        self.shared = 0
+        self._flights: dict[tuple, _Flight] = {}
+
+    async def do(self, key: tuple, fn: Callable[[Publish], Awaitable]):
+        return await asyncio.shield(self._join(key, fn).task)
+
+    async def subscribe(
+        self, key: tuple, fn: Callable[[Publish], Awaitable]
+    ) -> AsyncIterator:
+        """Eventos da execução; a exceção dela é relançada no final"""
+        flight = self._join(key, fn)
+        seen = 0
+
+        while True:
+            while seen < len(flight.events):
+                yield flight.events[seen]
+                seen += 1
+
+            if flight.task.done():
+                break
+
+            await flight.changed()
+
+        flight.task.result()
+
+    def stats(self) -> dict:
+        return {
+            "execucoes": self.leaders,
+            "compartilhadas": self.shared,
+            "em_andamento": len(self._flights),
+        }
+
+    def _join(self, key: tuple, fn: Callable[[Publish], Awaitable]):
+        flight = self._flights.get(key)
+
+        if flight is None:
+            flight = _Flight()
+            flight.task = asyncio.create_task(fn(flight.publish))
+            self._flights[key] = flight
+            flight.task.add_done_callback(partial(self._land, key, flight))
+            self.leaders += 1
+        else:
+            self.shared += 1
+
+        return flight
+
+    def _land(self, key: tuple, flight: _Flight, _):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        flight.notify()
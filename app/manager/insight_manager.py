@@ -0,0 +1,124 @@
+"""InsightManager"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+def fingerprint(data: dict) -> str:
+    """
+    Hash dos dados agregados, sem os limites do período: eles mudam a cada
+    requisição e o período já faz parte da chave do cache.
+    """
+
+    def strip(value):
+        if isinstance(value, dict):
+            return {k: strip(v) for k, v in value.items() if k != "periodo"}
+        if isinstance(value, list):
+            return [strip(v) for v in value]
+        return value
+
+    payload = json.dumps(strip(data), sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class InsightManager:
+    """
+    Cache com TTL e stale-while-revalidate para as respostas do CRM.
+
+    Dentro do TTL o resultado é devolvido sem consultar o banco. Depois
+    dele, e até max_stale, o resultado antigo continua sendo devolvido
+    enquanto uma atualização roda em segundo plano. A atualização só
+    chama o Gemini de novo se o fingerprint dos dados agregados mudou.
+    """
+
+    def __init__(self, ttl: int, max_stale: int, max_entries: int):
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.max_entries = max_entries
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.regenerated = 0
+        self.refresh_errors = 0
+        self._entries: OrderedDict[tuple, dict] = OrderedDict()
+        self._refreshing: dict[tuple, asyncio.Task] = {}
+
+    def get(self, key: tuple) -> tuple[dict | None, bool]:
+        """Devolve (entrada, fresca); entradas vencidas além de max_stale
+        são descartadas"""
+        entry = self._entries.get(key)
+        age = time.monotonic() - entry["gerado_em"] if entry else None
+
+        if entry is None or age > self.ttl + self.max_stale:
+            self.misses += 1
+            return None, False
+
+        self._entries.move_to_end(key)
+
+        if age <= self.ttl:
+            self.hits += 1
+            return entry, True
+
+        self.stale_hits += 1
+        return entry, False
+
+    def peek(self, key: tuple) -> dict | None:
+        return self._entries.get(key)
+
+    def set(self, key: tuple, value, data_fingerprint: str):
+        self._entries[key] = {
+            "valor": value,
+            "fingerprint": data_fingerprint,
+            "gerado_em": time.monotonic(),
+        }
+        self._entries.move_to_end(key)
+        self.regenerated += 1
+
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def touch(self, key: tuple):
+        """Renova a entrada cujos dados não mudaram desde a geração"""
+        entry = self._entries.get(key)
+        if entry:
+            entry["gerado_em"] = time.monotonic()
+            self.revalidated += 1
+
+    def revalidate(self, key: tuple, refresh):
+        """Agenda refresh() em segundo plano, uma vez por chave"""
+        if key in self._refreshing:
+            return
+
+        task = asyncio.create_task(refresh())
+        self._refreshing[key] = task
+        task.add_done_callback(lambda done: self._refresh_done(key, done))
+
+    def stats(self) -> dict:
+        return {
+            "itens": len(self._entries),
+            "acertos": self.hits,
+            "acertos_antigos": self.stale_hits,
+            "falhas": self.misses,
+            "revalidados_sem_llm": self.revalidated,
+            "gerados": self.regenerated,
+            "atualizando": len(self._refreshing),
+            "erros_atualizacao": self.refresh_errors,
+        }
+
+    def _refresh_done(self, key: tuple, task: asyncio.Task):
+        self._refreshing.pop(key, None)
+
+        if not task.cancelled() and task.exception() is not None:
+            self.refresh_errors += 1
+            logger.warning(
+                "Falha ao atualizar o cache do CRM %s: %s",
+                key,
+                task.exception(),
+            )
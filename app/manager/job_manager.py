@@ -0,0 +1,135 @@
+"""JobManager"""
+
+import asyncio
+import time
+import uuid
+from collections.abc import Callable
+
+
+class JobManager:
+    """
+    Fila limitada de jobs processados em segundo plano por um número fixo
+    de workers asyncio. Mantém o status de cada job para consulta.
+
+    O estado fica na memória do processo: com mais de um worker do
+    servidor, a consulta de um job só funciona no processo que o recebeu.
+    """
+
+    def __init__(self, workers: int, queue_size: int, retention: int):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.retention = retention
+        self.jobs: dict[str, dict] = {}
+        self.busy = 0
+        self.processed = 0
+        self.failed = 0
+        self.rejected = 0
+        self._busy_time = 0.0
+        self._started_at = None
+        self._queue = None
+        self._tasks = []
+
+    def start(self):
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._started_at = time.monotonic()
+        self._tasks = [
+            asyncio.create_task(self._worker()) for _ in range(self.workers)
+        ]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+        # Jobs que não chegaram a rodar ainda precisam liberar os recursos
+        while self._queue and not self._queue.empty():
+            _, _, _, cleanup = self._queue.get_nowait()
+            if cleanup:
+                cleanup()
+
+    def submit(
+        self, fn, *args, cleanup: Callable[[], object] | None = None
+    ) -> dict:
+        """
+        Enfileira fn(*args); levanta asyncio.QueueFull se a fila encher.
+        cleanup é chamado ao fim do job ou, se ele não rodar, no stop.
+        """
+        self._purge()
+
+        job = {
+            "id": str(uuid.uuid4()),
+            "status": "pendente",
+            "criado_em": time.time(),
+            "iniciado_em": None,
+            "finalizado_em": None,
+            "resultado": None,
+            "erro": None,
+        }
+
+        try:
+            self._queue.put_nowait((job, fn, args, cleanup))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise
+
+        self.jobs[job["id"]] = job
+        return job
+
+    def get(self, job_id: str) -> dict | None:
+        self._purge()
+        return self.jobs.get(job_id)
+
+    def stats(self) -> dict:
+        uptime = time.monotonic() - self._started_at if self._started_at else 0
+
+        return {
+            "fila": self._queue.qsize() if self._queue else 0,
+            "capacidade_fila": self.queue_size,
+            "workers": self.workers,
+            "workers_ocupados": self.busy,
+            "utilizacao_atual": self.busy / self.workers,
+            "utilizacao_media": (
+                self._busy_time / (self.workers * uptime) if uptime else 0.0
+            ),
+            "processados": self.processed,
+            "falhas": self.failed,
+            "rejeitados": self.rejected,
+            "jobs_armazenados": len(self.jobs),
+        }
+
+    async def _worker(self):
+        while True:
+            job, fn, args, cleanup = await self._queue.get()
+            started = time.monotonic()
+            self.busy += 1
+            job["status"] = "processando"
+            job["iniciado_em"] = time.time()
+
+            try:
+                job["resultado"] = await fn(*args)
+                job["status"] = "concluido"
+                self.processed += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                job["erro"] = getattr(e, "detail", None) or str(e)
+                job["status"] = "erro"
+                self.failed += 1
+            finally:
+                job["finalizado_em"] = time.time()
+                self.busy -= 1
+                self._busy_time += time.monotonic() - started
+                self._queue.task_done()
+                if cleanup:
+                    cleanup()
+
+    def _purge(self):
+        limit = time.time() - self.retention
+        expired = [
+            job_id
+            for job_id, job in self.jobs.items()
+            if job["finalizado_em"] and job["finalizado_em"] < limit
+        ]
+        for job_id in expired:
+            del self.jobs[job_id]
@@ -1,6 +1,8 @@
 """PathManager"""
 
 import os
+import shutil
+import tempfile
 
 from fastapi import UploadFile
 
@@ -8,12 +10,10 @@ from fastapi import UploadFile
 class PathManager:
     def __init__(self):
         self.path_pdf = os.path.join(os.getcwd(), "app", "pdf")
-        self.path_product = os.path.join(
-            os.getcwd(), "app", "upload", "products.txt"
-        )
         self.path_prompt = os.path.join(
-            os.getcwd(), "app", "gemini", "criacao_produtos.txt"
+            os.getcwd(), "app", "gemini", "nomes_produtos.txt"
         )
+        self.chunk_size = 1024 * 1024
 
     def read_path(self, path: str) -> str:
         with open(path, "r", encoding="utf-8") as path_file:
@@ -23,7 +23,36 @@ class PathManager:
         return os.path.exists(path)
 
     def create_path(self, path: str, file: UploadFile) -> str:
-        return os.path.join(path, file.filename)
+        return os.path.join(path, os.path.basename(file.filename))
+
+    def create_workspace(self) -> str:
+        """Cria uma pasta temporária exclusiva para a requisição"""
+        return tempfile.mkdtemp(prefix="req-", dir=self.path_pdf)
+
+    def remove_workspace(self, path: str) -> bool:
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+            return True
+        return False
+
+    async def save_upload(
+        self, file: UploadFile, path: str, head: bytes = b""
+    ) -> str:
+        """Grava o upload em disco em blocos, sem carregá-lo inteiro"""
+        with open(path, "wb") as p:
+            p.write(head)
+
+            while chunk := await file.read(self.chunk_size):
+                p.write(chunk)
+
+        return path
+
+    def write_file(self, workspace: str, name: str, data: bytes) -> str:
+        path = os.path.join(workspace, name)
+        with open(path, "wb") as p:
+            p.write(data)
+
+        return path
 
     def remove_path(self, path: str) -> bool:
         if os.path.exists(path):
@@ -0,0 +1,35 @@
+"""PoolManager"""
+
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+
+class PoolManager:
+    """Pool de processos para o trabalho pesado de CPU (fitz e pandas)"""
+
+    def __init__(self, max_workers: int):
+        self.max_workers = max_workers
+        self._executor = None
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        # Criado sob demanda; "spawn" evita herdar threads do uvicorn
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    async def run(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor, partial(fn, *args, **kwargs)
+        )
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,209 @@
+"""ProductManager"""
+
+import logging
+from decimal import Decimal
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import text
+
+from app.db.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# Marca encontrada pelo nome como nos scripts de carga ("O Boticário")
+BRAND = text("""
+SELECT id FROM marca
+WHERE nome ILIKE '%' || :marca || '%'
+ORDER BY criado_em
+LIMIT 1
+""")
+
+# Registra a nota; sem linha de volta, ela já foi somada ao estoque. A
+# tabela vem de migrations/001_nota_processada.sql
+REGISTER = text("""
+INSERT INTO nota_processada (chave, marca_id, itens, processada_em)
+VALUES (:chave, :marca_id, :itens, timezone('utc', now()))
+ON CONFLICT (chave) DO NOTHING
+RETURNING chave
+""")
+
+# Trava só os SKUs da marca na nota, sempre na mesma ordem, para dois
+# upserts do mesmo SKU não inserirem o produto duas vezes sem bloquear os
+# demais (nem o mesmo SKU de outra marca)
+LOCK = text("""
+SELECT pg_advisory_xact_lock(hashtext('produto'), chave)
+FROM (
+    SELECT DISTINCT hashtext(CAST(:marca_id AS text) || '/' || sku) AS chave
+    FROM unnest(CAST(:skus AS varchar[])) AS sku
+    ORDER BY chave
+) AS travas
+""")
+
+# A coluna sku não é única (nem entre marcas), então o upsert é feito em
+# uma única instrução: atualiza os SKUs existentes da marca e insere
+# apenas os que não foram atualizados.
+UPSERT = text("""
+WITH dados AS (
+    SELECT d.*, CAST(:marca_id AS uuid) AS marca_id
+    FROM unnest(
+        CAST(:skus AS varchar[]),
+        CAST(:nomes AS varchar[]),
+        CAST(:descricoes AS varchar[]),
+        CAST(:quantidades AS numeric[]),
+        CAST(:precos AS float8[]),
+        CAST(:valores AS float8[]),
+        CAST(:tags AS varchar[]),
+        CAST(:catalogos AS boolean[])
+    ) AS d(
+        sku, nome, descricao, quantidade, preco_unitario, valor_venda,
+        tag, catalogo
+    )
+),
+atualizados AS (
+    UPDATE produto AS p
+    SET quantidade = COALESCE(p.quantidade, 0) + d.quantidade,
+        preco_unitario = d.preco_unitario,
+        atualizado_em = timezone('utc', now())
+    FROM dados AS d
+    WHERE p.sku = d.sku AND p.marca_id = d.marca_id
+    RETURNING p.sku, p.marca_id
+),
+inseridos AS (
+    INSERT INTO produto (
+        id, nome, descricao, sku, preco_unitario, valor_venda, quantidade,
+        catalogo, tag, marca_id, criado_em, atualizado_em
+    )
+    SELECT
+        gen_random_uuid(), d.nome, d.descricao, d.sku, d.preco_unitario,
+        d.valor_venda, d.quantidade, d.catalogo, d.tag, d.marca_id,
+        timezone('utc', now()), timezone('utc', now())
+    FROM dados AS d
+    WHERE NOT EXISTS (
+        SELECT 1
+        FROM atualizados AS a
+        WHERE a.sku = d.sku AND a.marca_id = d.marca_id
+    )
+    RETURNING 1
+)
+SELECT
+    (SELECT count(DISTINCT sku) FROM atualizados) AS atualizados,
+    (SELECT count(*) FROM inseridos) AS inseridos
+""")
+
+
+class ProductManager:
+    """
+    Grava os produtos extraídos direto na tabela produto: SKUs já
+    cadastrados têm a quantidade somada; os demais são inseridos com a
+    marca encontrada pelo nome.
+
+    Cada nota é gravada uma única vez: a chave (chave de acesso da NF-e ou
+    SHA-256 do conteúdo) é registrada em nota_processada na mesma
+    transação, e uma nota repetida (nova tentativa, envio duplo, o mesmo
+    arquivo duas vezes no lote) não soma o estoque de novo.
+    """
+
+    def __init__(self):
+        self.updated = 0
+        self.inserted = 0
+        self.repeated = 0
+
+    async def persist(
+        self, products: list[dict], brand: str, key: str
+    ) -> dict:
+        if not products:
+            return {"atualizados": 0, "inseridos": 0, "repetida": False}
+
+        result = await run_in_threadpool(
+            self._upsert, self._merge(products), brand, key
+        )
+
+        if result["repetida"]:
+            self.repeated += 1
+            logger.info("Nota %s já gravada: estoque mantido", key)
+            return result
+
+        self.updated += result["atualizados"]
+        self.inserted += result["inseridos"]
+        logger.info(
+            "Produtos gravados: %d atualizados, %d inseridos",
+            result["atualizados"],
+            result["inseridos"],
+        )
+
+        return result
+
+    def stats(self) -> dict:
+        return {
+            "atualizados": self.updated,
+            "inseridos": self.inserted,
+            "notas_repetidas": self.repeated,
+        }
+
+    @staticmethod
+    def _merge(products: list[dict]) -> list[dict]:
+        """Soma as quantidades de itens repetidos na nota, por SKU"""
+        merged = {}
+        for product in products:
+            current = merged.get(product["sku"])
+            if current is None:
+                merged[product["sku"]] = dict(product)
+            else:
+                current["quantidade"] += product["quantidade"]
+
+        return list(merged.values())
+
+    @staticmethod
+    def _quantities(products: list[dict]) -> list[Decimal]:
+        """
+        Quantidades exatas; produto.quantidade é inteira, então uma
+        quantidade fracionária é recusada em vez de ser arredondada.
+        """
+        quantities = [Decimal(str(p["quantidade"])) for p in products]
+
+        fractional = [
+            p["sku"]
+            for p, quantity in zip(products, quantities)
+            if quantity != quantity.to_integral_value()
+        ]
+        if fractional:
+            raise ValueError(
+                "Quantidade fracionária não cabe em produto.quantidade "
+                f"(inteira): {', '.join(fractional)}"
+            )
+
+        return quantities
+
+    def _upsert(self, products: list[dict], brand: str, key: str) -> dict:
+        params = {
+            "skus": [p["sku"] for p in products],
+            "nomes": [p["nome"] for p in products],
+            "descricoes": [p["descricao"] for p in products],
+            "quantidades": self._quantities(products),
+            "precos": [p["precoUnitario"] for p in products],
+            "valores": [p["valorVenda"] for p in products],
+            "tags": [p["tag"] for p in products],
+            "catalogos": [p["catalogo"] for p in products],
+        }
+
+        with SessionLocal() as db, db.begin():
+            marca_id = db.execute(BRAND, {"marca": brand}).scalar()
+            if marca_id is None:
+                raise ValueError(f"Marca {brand} não encontrada no banco")
+
+            registered = db.execute(
+                REGISTER,
+                {"chave": key, "marca_id": marca_id, "itens": len(products)},
+            ).scalar()
+            if registered is None:
+                return {"atualizados": 0, "inseridos": 0, "repetida": True}
+
+            params["marca_id"] = marca_id
+            db.execute(LOCK, params)
+            row = db.execute(UPSERT, params).one()
+
+        return {
+            "atualizados": row.atualizados,
+            "inseridos": row.inseridos,
+            "repetida": False,
+        }
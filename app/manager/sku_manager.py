@@ -0,0 +1,149 @@
+"""SkuManager"""
+
+import asyncio
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.db.database import SessionLocal
+from app.db.models import Marca, Produto
+
+logger = logging.getLogger(__name__)
+
+
+class SkuManager:
+    """
+    Memória persistente de (marca, SKU) -> nome do produto. Consulta
+    primeiro o cache local, depois as colunas sku/nome da tabela produto
+    da marca; os nomes novos inferidos pelo Gemini são gravados no arquivo
+    local.
+
+    A memória guarda no máximo `max_entries` nomes, descartando os menos
+    usados. O arquivo é regravado de forma atômica no threadpool, uma
+    gravação por vez e sempre com o estado mais recente.
+    """
+
+    def __init__(self, path: str | None = None, max_entries: int = 100000):
+        self.path = path
+        self.max_entries = max_entries
+        self.names: OrderedDict[tuple[str, str], str] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._dirty = False
+        self._write_lock = asyncio.Lock()
+
+        if self.path and os.path.exists(self.path):
+            self._load()
+
+    async def resolve(self, brand: str, skus: list[str]) -> dict[str, str]:
+        """Devolve os nomes já conhecidos para os SKUs da marca"""
+        found = {}
+        for sku in skus:
+            name = self.names.get((brand, sku))
+            if name is not None:
+                self.names.move_to_end((brand, sku))
+                found[sku] = name
+
+        missing = [sku for sku in skus if sku not in found]
+
+        if missing:
+            try:
+                stored = await run_in_threadpool(
+                    self._query_db, brand, missing
+                )
+            except Exception as e:
+                # Sem o banco a memória só não é consultada; segue para o LLM
+                logger.warning("Falha ao consultar SKUs no banco: %s", e)
+                stored = {}
+
+            self._store(brand, stored)
+            found.update(stored)
+
+        self.hits += len(found)
+        self.misses += len(skus) - len(found)
+
+        return found
+
+    async def remember(self, brand: str, names: dict[str, str]):
+        names = {
+            sku: name
+            for sku, name in names.items()
+            if isinstance(name, str) and name
+        }
+        if not names:
+            return
+
+        self._store(brand, names)
+
+        if self.path:
+            self._dirty = True
+            await self._flush()
+
+    def stats(self) -> dict:
+        return {
+            "skus_conhecidos": len(self.names),
+            "limite": self.max_entries,
+            "acertos": self.hits,
+            "falhas": self.misses,
+        }
+
+    def _store(self, brand: str, names: dict[str, str]):
+        for sku, name in names.items():
+            self.names[(brand, sku)] = name
+            self.names.move_to_end((brand, sku))
+
+        while len(self.names) > self.max_entries:
+            self.names.popitem(last=False)
+
+    async def _flush(self):
+        # Quem espera a gravação em andamento encontra o estado já gravado
+        # pela próxima, que leva todas as alterações feitas até ali
+        async with self._write_lock:
+            if not self._dirty:
+                return
+
+            self._dirty = False
+            entries = [
+                [brand, sku, name] for (brand, sku), name in self.names.items()
+            ]
+            await run_in_threadpool(self._write, entries)
+
+    def _write(self, entries: list[list[str]]):
+        tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entries, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def _load(self):
+        with open(self.path, "r", encoding="utf-8") as f:
+            entries = json.load(f)
+
+        # O formato antigo era indexado só pelo SKU, sem a marca
+        if not isinstance(entries, list):
+            logger.warning(
+                "Memória de SKUs em %s sem a marca: ignorada", self.path
+            )
+            return
+
+        for brand, sku, name in entries[-self.max_entries :]:
+            self.names[(brand, sku)] = name
+
+    @staticmethod
+    def _query_db(brand: str, skus: list[str]) -> dict[str, str]:
+        with SessionLocal() as db:
+            rows = (
+                db.query(Produto.sku, Produto.nome)
+                .join(Marca, Produto.marca_id == Marca.id)
+                .filter(
+                    Marca.nome.ilike(f"%{brand}%"),
+                    Produto.sku.in_(skus),
+                    Produto.nome.isnot(None),
+                )
+                .all()
+            )
+
+        return {row.sku: row.nome for row in rows}
@@ -1 +1,41 @@
-from app.modules import boticario as boticario
+"""
+Registro dos módulos de fornecedores.
+
+Cada módulo declara aqui uma impressão digital barata: textos que
+precisam estar na primeira página do PDF para que o módulo consiga
+processá-lo. O módulo em si só é importado no primeiro uso.
+"""
+
+import importlib
+
+REGISTRY = {
+    "boticario": {
+        # Cabeçalho da tabela de itens, repetido em todas as folhas; o
+        # rodapé ("RESERVADO AO FISCO") só vem na última folha da nota
+        "markers": ("\nIPI\nICMS",),
+    },
+}
+
+
+def exists(name: str) -> bool:
+    return name in REGISTRY
+
+
+def load(name: str):
+    """Importa o módulo sob demanda (o Python mantém o cache do import)"""
+    if name not in REGISTRY:
+        raise LookupError(f"Módulo {name} não encontrado")
+
+    return importlib.import_module(f"{__name__}.{name}")
+
+
+def detect(first_page: str) -> str | None:
+    """Identifica o módulo pelo texto da primeira página do PDF"""
+    matches = [
+        (len(spec["markers"]), name)
+        for name, spec in REGISTRY.items()
+        if all(marker in first_page for marker in spec["markers"])
+    ]
+
+    # Em caso de mais de um candidato, vence a impressão mais específica
+    return max(matches)[1] if matches else None
@@ -1,40 +1,93 @@
+import numpy as np
 import pandas as pd
 
-from app.gemini import gen
-from app.utils.pdf_transform import transform_df
-
-
-def create_df(content: str):
-    # Apagando texto desnecessário
-    remove_data = content.split("\nIPI\nICMS")
-    remove_data = remove_data[1].split("RESERVADO AO FISCO")
-
-    lines = remove_data[0].strip().split("\n")
-
-    # Colunas do DataFrame
-    header = [
-        "CÓD. PRODUTO",
-        "DESCRIÇÃO DOS PRODUTOS/SERVIÇOS",
-        "NCM/SH",
-        "CST",
-        "CFOP",
-        "UNID.",
-        "QUANT.",
-        "VALOR UNITÁRIO",
-        "VALOR TOTAL",
-        "B.CALC.ICMS",
-        "VALOR ICMS",
-        "VALOR I.P.I.",
-        "A. IPI",
-        "A. ICMS",
-    ]
-
-    data = []
-    for i in range(0, len(lines), 14):
-        row = lines[i : i + 14]
-        data.append(row)
-
-    df = pd.DataFrame(data, columns=header)
-    transform_df(df)
-
-    return gen.gen_json()
+from app.utils.pdf_transform import parse_decimals, slugify
+
+BRAND = "Boticário"
+TAG = "boticario"
+ID_MARCA = 1
+
+# Colunas dos produtos enviadas ao Gemini para inferir o nome
+PROMPT_COLUMNS = ("sku",)
+
+# Colunas do DataFrame
+HEADER = [
+    "CÓD. PRODUTO",
+    "DESCRIÇÃO DOS PRODUTOS/SERVIÇOS",
+    "NCM/SH",
+    "CST",
+    "CFOP",
+    "UNID.",
+    "QUANT.",
+    "VALOR UNITÁRIO",
+    "VALOR TOTAL",
+    "B.CALC.ICMS",
+    "VALOR ICMS",
+    "VALOR I.P.I.",
+    "A. IPI",
+    "A. ICMS",
+]
+
+# Tabela de itens lida pelas coordenadas (ver app/utils/pdf_table.py)
+TABLE = {
+    "header": ("IPI", "ICMS"),
+    "end": "RESERVADO AO FISCO",
+    "columns": len(HEADER),
+}
+
+NUMERIC_COLUMNS = [
+    "QUANT.",
+    "VALOR UNITÁRIO",
+    "VALOR TOTAL",
+    "B.CALC.ICMS",
+    "VALOR ICMS",
+    "VALOR I.P.I.",
+    "A. IPI",
+    "A. ICMS",
+]
+
+
+def create_df(rows: list[list[str]]) -> pd.DataFrame:
+    """DataFrame a partir das linhas já separadas em colunas"""
+    if not rows:
+        raise ValueError("Nenhum item encontrado na tabela de produtos")
+
+    return _typed_df(np.array(rows, dtype=object))
+
+
+def _typed_df(data: np.ndarray) -> pd.DataFrame:
+    df = pd.DataFrame(data, columns=HEADER)
+    df[NUMERIC_COLUMNS] = df[NUMERIC_COLUMNS].apply(parse_decimals)
+
+    return df
+
+
+def create_products(df: pd.DataFrame) -> list[dict]:
+    """
+    Monta os produtos localmente a partir do DataFrame. Apenas o nome real
+    do produto fica para o Gemini; até lá nome e descrição usam o texto
+    da nota.
+    """
+    descriptions = df["DESCRIÇÃO DOS PRODUTOS/SERVIÇOS"].str.strip()
+    quantities = df["QUANT."]
+    prices = df["VALOR UNITÁRIO"]
+
+    if (quantities % 1 == 0).all():
+        quantities = quantities.astype("int64")
+
+    products = pd.DataFrame(
+        {
+            "nome": descriptions,
+            "sku": descriptions.map(slugify),
+            "descricao": descriptions,
+            "tag": TAG,
+            "quantidade": quantities,
+            "precoUnitario": prices,
+            "valorVenda": prices,
+            "catalogo": True,
+            "imagemUrl": None,
+            "idMarca": ID_MARCA,
+        }
+    )
+
+    return products.to_dict("records")
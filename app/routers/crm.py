@@ -1,58 +1,162 @@
 """CRM Routes"""
 
-from fastapi import APIRouter, Depends, Query, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Query, status
+from fastapi.responses import StreamingResponse
 
 from app.controllers import crm_controller
-from app.db.database import get_db
 
 router = APIRouter(prefix="/crm", tags=["CRM"])
 
+# Evita que proxies acumulem os eventos antes de repassar ao cliente
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+async def _sse(
+    name: str, periodo: str, bypass_cache: bool
+) -> StreamingResponse:
+    # Erros antes do primeiro evento saem como resposta HTTP de erro
+    content = await crm_controller.stream_insight(name, periodo, bypass_cache)
+    return StreamingResponse(
+        content,
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+    )
+
 
 @router.get(
     "/relatorio-financeiro",
     status_code=status.HTTP_200_OK,
 )
-def relatorio_financeiro(
-    periodo: str = Query(default="mes_atual", description="Período de análise"),
-    db: Session = Depends(get_db)
+async def relatorio_financeiro(
+    periodo: str = Query(
+        default="mes_atual", description="Período de análise"
+    ),
+    bypass_cache: bool = Query(
+        default=False, description="Ignora o cache e gera uma nova resposta"
+    ),
 ):
     """Gera relatório financeiro resumido usando IA"""
-    return crm_controller.get_relatorio_financeiro(db, periodo)
+    return await crm_controller.get_relatorio_financeiro(periodo, bypass_cache)
+
+
+@router.get(
+    "/relatorio-financeiro/stream",
+    status_code=status.HTTP_200_OK,
+)
+async def relatorio_financeiro_stream(
+    periodo: str = Query(
+        default="mes_atual", description="Período de análise"
+    ),
+    bypass_cache: bool = Query(
+        default=False, description="Ignora o cache e gera uma nova resposta"
+    ),
+):
+    """Versão SSE: dados agregados, texto da IA em partes e JSON final"""
+    return await _sse("relatorio-financeiro", periodo, bypass_cache)
 
 
 @router.get(
     "/alertas-reabastecimento",
     status_code=status.HTTP_200_OK,
 )
-def alertas_reabastecimento(
-    periodo: str = Query(default="mes_atual", description="Período de análise"),
-    db: Session = Depends(get_db)
+async def alertas_reabastecimento(
+    periodo: str = Query(
+        default="mes_atual", description="Período de análise"
+    ),
+    bypass_cache: bool = Query(
+        default=False, description="Ignora o cache e gera uma nova resposta"
+    ),
 ):
     """Gera alertas de reabastecimento de estoque usando IA"""
-    return crm_controller.get_alertas_reabastecimento(db, periodo)
+    return await crm_controller.get_alertas_reabastecimento(
+        periodo, bypass_cache
+    )
+
+
+@router.get(
+    "/alertas-reabastecimento/stream",
+    status_code=status.HTTP_200_OK,
+)
+async def alertas_reabastecimento_stream(
+    periodo: str = Query(
+        default="mes_atual", description="Período de análise"
+    ),
+    bypass_cache: bool = Query(
+        default=False, description="Ignora o cache e gera uma nova resposta"
+    ),
+):
+    """Versão SSE: dados agregados, texto da IA em partes e JSON final"""
+    return await _sse("alertas-reabastecimento", periodo, bypass_cache)
 
 
 @router.get(
     "/previsao-demanda",
     status_code=status.HTTP_200_OK,
 )
-def previsao_demanda(
-    periodo: str = Query(default="mes_atual", description="Período de análise"),
-    db: Session = Depends(get_db)
+async def previsao_demanda(
+    periodo: str = Query(
+        default="mes_atual", description="Período de análise"
+    ),
+    bypass_cache: bool = Query(
+        default=False, description="Ignora o cache e gera uma nova resposta"
+    ),
 ):
     """Gera previsão de demanda usando IA"""
-    return crm_controller.get_previsao_demanda(db, periodo)
+    return await crm_controller.get_previsao_demanda(periodo, bypass_cache)
+
+
+@router.get(
+    "/previsao-demanda/stream",
+    status_code=status.HTTP_200_OK,
+)
+async def previsao_demanda_stream(
+    periodo: str = Query(
+        default="mes_atual", description="Período de análise"
+    ),
+    bypass_cache: bool = Query(
+        default=False, description="Ignora o cache e gera uma nova resposta"
+    ),
+):
+    """Versão SSE: dados agregados, texto da IA em partes e JSON final"""
+    return await _sse("previsao-demanda", periodo, bypass_cache)
 
 
 @router.get(
     "/proxima-acao",
     status_code=status.HTTP_200_OK,
 )
-def proxima_acao(
-    periodo: str = Query(default="mes_atual", description="Período de análise"),
-    db: Session = Depends(get_db)
+async def proxima_acao(
+    periodo: str = Query(
+        default="mes_atual", description="Período de análise"
+    ),
+    bypass_cache: bool = Query(
+        default=False, description="Ignora o cache e gera uma nova resposta"
+    ),
 ):
     """Sugere próxima melhor ação usando IA"""
-    return crm_controller.get_proxima_acao(db, periodo)
+    return await crm_controller.get_proxima_acao(periodo, bypass_cache)
+
 
+@router.get(
+    "/proxima-acao/stream",
+    status_code=status.HTTP_200_OK,
+)
+async def proxima_acao_stream(
+    periodo: str = Query(
+        default="mes_atual", description="Período de análise"
+    ),
+    bypass_cache: bool = Query(
+        default=False, description="Ignora o cache e gera uma nova resposta"
+    ),
+):
+    """Versão SSE: dados agregados, texto da IA em partes e JSON final"""
+    return await _sse("proxima-acao", periodo, bypass_cache)
+
+
+@router.get(
+    "/stats",
+    status_code=status.HTTP_200_OK,
+)
+async def get_stats():
+    """CRM Stats (cache, single-flight and LLM gateway)"""
+    return crm_controller.get_stats()
@@ -1,6 +1,8 @@
 """File Routes"""
 
-from fastapi import APIRouter, UploadFile, status
+from fastapi import APIRouter, Query, UploadFile, status
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 
 from app.controllers import file_controller
 
@@ -11,6 +13,117 @@ router = APIRouter(prefix="/files", tags=["Files"])
     "/{type}",
     status_code=status.HTTP_200_OK,
 )
-async def create_file(type: str, file: UploadFile):
+async def create_file(
+    type: str,
+    file: UploadFile,
+    bypass_cache: bool = Query(
+        default=False, description="Ignora o cache e reprocessa o PDF"
+    ),
+    persist: bool = Query(
+        default=False,
+        description="Grava os produtos na tabela produto (soma a quantidade "
+        "dos SKUs já cadastrados)",
+    ),
+):
     """Create File"""
-    return await file_controller.create_file(type=type, file=file)
+    return await file_controller.create_file(
+        type=type, file=file, bypass_cache=bypass_cache, persist=persist
+    )
+
+
+@router.post(
+    "/{type}/batch",
+    status_code=status.HTTP_200_OK,
+)
+async def create_batch(
+    type: str,
+    files: list[UploadFile],
+    bypass_cache: bool = Query(
+        default=False, description="Ignora o cache e reprocessa os PDFs"
+    ),
+    persist: bool = Query(
+        default=False,
+        description="Grava os produtos na tabela produto (soma a quantidade "
+        "dos SKUs já cadastrados)",
+    ),
+):
+    """Create Files in Batch"""
+    return await file_controller.create_batch(
+        type=type, files=files, bypass_cache=bypass_cache, persist=persist
+    )
+
+
+@router.post(
+    "/{type}/stream",
+    status_code=status.HTTP_200_OK,
+)
+async def stream_file(
+    type: str,
+    file: UploadFile,
+    bypass_cache: bool = Query(
+        default=False, description="Ignora o cache e reprocessa as notas"
+    ),
+    persist: bool = Query(
+        default=False,
+        description="Grava os produtos na tabela produto (soma a quantidade "
+        "dos SKUs já cadastrados)",
+    ),
+):
+    """Create File as NDJSON, one line per invoice"""
+    content, cleanup = await file_controller.stream_file(
+        type=type, file=file, bypass_cache=bypass_cache, persist=persist
+    )
+    return StreamingResponse(
+        content,
+        media_type="application/x-ndjson",
+        background=BackgroundTask(cleanup),
+    )
+
+
+@router.post(
+    "/{type}/jobs",
+    status_code=status.HTTP_202_ACCEPTED,
+)
+async def create_job(
+    type: str,
+    file: UploadFile,
+    bypass_cache: bool = Query(
+        default=False, description="Ignora o cache e reprocessa o PDF"
+    ),
+    persist: bool = Query(
+        default=False,
+        description="Grava os produtos na tabela produto (soma a quantidade "
+        "dos SKUs já cadastrados)",
+    ),
+):
+    """Create File Job"""
+    return await file_controller.create_job(
+        type=type, file=file, bypass_cache=bypass_cache, persist=persist
+    )
+
+
+@router.get(
+    "/stats",
+    status_code=status.HTTP_200_OK,
+)
+async def get_stats():
+    """Ingestion Stats (tokens, cache, jobs and LLM gateway)"""
+    return file_controller.get_stats()
+
+
+@router.get(
+    "/jobs/stats",
+    status_code=status.HTTP_200_OK,
+)
+async def get_job_stats():
+    """Job Queue Stats"""
+    return file_controller.get_job_stats()
+
+
+@router.get(
+    "/jobs/{job_id}",
+    status_code=status.HTTP_200_OK,
+)
+async def get_job(job_id: str):
+    """Get File Job"""
+    return file_controller.get_job(job_id)
@@ -0,0 +1,210 @@
+"""
+Benchmark do pipeline de extração de NF-e
+
+Gera notas sintéticas e mede, em cada etapa (extração, DataFrame, produtos,
+serialização do prompt e Gemini simulado), a latência, a vazão em itens/s
+e o pico de memória alocada. Não faz chamadas externas.
+
+    python -m app.test.benchmark
+    python -m app.test.benchmark --itens 5000 --paginas 300 --json
+"""
+
+import argparse
+import asyncio
+import json
+import resource
+import statistics
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+from app.gemini import gen
+from app.gemini.provider import provider
+from app.gemini.stub import StubClient
+from app.modules import boticario
+from app.test.synthetic_invoice import generate
+from app.utils import pdf_extraction
+from app.utils.pdf_transform import transform_products
+
+TYPE = "boticario"
+
+# (itens, páginas) executados quando nenhum cenário é informado
+SCENARIOS = [
+    (10, 1),
+    (100, 3),
+    (1000, 25),
+    (5000, 120),
+    (5000, 300),
+]
+
+
+def _stub_gemini(latency: float):
+    """Troca o cliente compartilhado do Gemini pelo simulado"""
+    provider.set(StubClient(latency))
+
+
+def _extract_parallel(pdf: bytes, workers: int) -> list[list[str]]:
+    shards = pdf_extraction.shard_pages(
+        pdf_extraction.page_count(pdf), workers
+    )
+    with ProcessPoolExecutor(workers, mp_context=get_context("spawn")) as ex:
+        parts = ex.map(
+            pdf_extraction.extract_pages,
+            *zip(*((TYPE, pdf, start, stop) for start, stop in shards)),
+        )
+        return pdf_extraction.join_pages(list(parts))
+
+
+def _measure(fn, repeat: int) -> tuple[dict, object]:
+    """Mediana de `repeat` execuções e pico de memória de uma execução"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "segundos": statistics.median(timings),
+        "pico_bytes": peak,
+    }, result
+
+
+def run_scenario(items: int, pages: int, options: argparse.Namespace) -> dict:
+    """Executa todas as etapas para uma nota com `items` e `pages`"""
+    repeat = options.repeticoes
+    _stub_gemini(options.latencia)
+    pdf = generate(items, pages, options.quebras)
+
+    stages = {
+        "extracao": lambda: pdf_extraction.join_pages(
+            [pdf_extraction.extract_pages(TYPE, pdf)]
+        ),
+    }
+    if options.workers > 1:
+        stages["extracao_paralela"] = lambda: _extract_parallel(
+            pdf, options.workers
+        )
+
+    results = {}
+    timings, rows = _measure(stages.pop("extracao"), repeat)
+    results["extracao"] = timings
+    for name, fn in stages.items():
+        results[name], _ = _measure(fn, repeat)
+
+    results["dataframe"], df = _measure(
+        lambda: boticario.create_df(rows), repeat
+    )
+    results["produtos"], products = _measure(
+        lambda: boticario.create_products(df), repeat
+    )
+    results["serializacao"], _ = _measure(
+        lambda: transform_products(products, boticario.PROMPT_COLUMNS),
+        repeat,
+    )
+    results["gemini_simulado"], _ = _measure(
+        lambda: gen.apply_names(
+            products,
+            asyncio.run(
+                gen.gen_names(
+                    products, boticario.BRAND, boticario.PROMPT_COLUMNS
+                )
+            ),
+        ),
+        repeat,
+    )
+
+    if len(products) != items:
+        raise ValueError(
+            f"Esperado {items} produtos, extraídos {len(products)}"
+        )
+
+    for timings in results.values():
+        seconds = timings["segundos"]
+        timings["itens_por_segundo"] = items / seconds if seconds else None
+
+    return {
+        "itens": items,
+        "paginas": pages,
+        "pdf_bytes": len(pdf),
+        "etapas": results,
+    }
+
+
+def _max_rss() -> int:
+    """Pico de memória residente do processo, em bytes"""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+def _print_report(reports: list[dict]):
+    print(
+        f"{'itens':>6} {'pág.':>5} {'etapa':<18} {'ms':>10} "
+        f"{'itens/s':>12} {'pico MiB':>9}"
+    )
+    for report in reports:
+        for stage, timings in report["etapas"].items():
+            rate = timings["itens_por_segundo"] or 0
+            print(
+                f"{report['itens']:>6} {report['paginas']:>5} {stage:<18} "
+                f"{timings['segundos'] * 1000:>10.2f} {rate:>12,.0f} "
+                f"{timings['pico_bytes'] / 2**20:>9.2f}"
+            )
+    print(f"\nPico de memória residente: {_max_rss() / 2**20:.1f} MiB")
+
+
+def _parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--itens", type=int, help="itens da nota")
+    parser.add_argument("--paginas", type=int, help="páginas da nota")
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument(
+        "--quebras",
+        type=float,
+        default=0.1,
+        help="fração de descrições quebradas em duas linhas",
+    )
+    parser.add_argument(
+        "--latencia",
+        type=float,
+        default=0.0,
+        help="latência simulada do Gemini, em segundos",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=0,
+        help="mede também a extração dividida entre N processos",
+    )
+    parser.add_argument("--json", action="store_true", help="saída em JSON")
+    return parser
+
+
+def main(argv: list[str] | None = None):
+    args = _parser().parse_args(argv)
+
+    if args.itens or args.paginas:
+        scenarios = [(args.itens or 100, args.paginas or 1)]
+    else:
+        scenarios = SCENARIOS
+
+    reports = [run_scenario(items, pages, args) for items, pages in scenarios]
+
+    if args.json:
+        print(
+            json.dumps(
+                {"cenarios": reports, "pico_rss_bytes": _max_rss()}, indent=2
+            )
+        )
+    else:
+        _print_report(reports)
+
+
+if __name__ == "__main__":
+    main()
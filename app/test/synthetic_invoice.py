@@ -0,0 +1,226 @@
+"""Gerador de NF-e (DANFE) sintéticas no layout do Boticário"""
+
+import random
+
+import fitz
+
+# (x, largura) de cada coluna da tabela de itens, em pontos
+COLUMNS = [
+    (20, 30),
+    (52, 120),
+    (174, 34),
+    (210, 16),
+    (228, 20),
+    (250, 16),
+    (268, 30),
+    (300, 36),
+    (338, 36),
+    (376, 36),
+    (414, 30),
+    (446, 30),
+    (478, 20),
+    (500, 20),
+]
+
+HEADER = [
+    "CÓD. PRODUTO",
+    "DESCRIÇÃO DOS PRODUTOS/SERVIÇOS",
+    "NCM/SH",
+    "CST",
+    "CFOP",
+    "UNID.",
+    "QUANT.",
+    "VALOR UNITÁRIO",
+    "VALOR TOTAL",
+    "B.CALC.ICMS",
+    "VALOR ICMS",
+    "VALOR I.P.I.",
+    "ALÍQ.",
+    "ALÍQ.",
+]
+
+LINES = ["EGEO", "MALBEC", "LILY", "FLORATTA", "QUASAR", "NATIVA SPA", "ZAAD"]
+KINDS = ["DES COL", "EAU DE PARFUM", "LOC HIDRAT", "OLEO CORP", "BODY SPLASH"]
+VARIANTS = ["VANILLA VIBE", "BLUE", "RED", "GOLD", "INTENSE", "ROSE", "NOIR"]
+VOLUMES = [30, 75, 90, 100, 200, 250]
+
+PAGE_WIDTH = 595
+PAGE_HEIGHT = 842
+TABLE_TOP = 110
+TABLE_BOTTOM = 780
+FONT_SIZE = 5
+ROW_HEIGHT = 9
+WRAP_HEIGHT = 6
+# Itens que cabem em uma página mesmo com todas as descrições quebradas
+MAX_ROWS_PER_PAGE = (TABLE_BOTTOM - TABLE_TOP) // (ROW_HEIGHT + WRAP_HEIGHT)
+
+
+def _brl(value: float) -> str:
+    """Formata no padrão brasileiro: 1.234,56"""
+    return (
+        f"{value:,.2f}".replace(",", "_").replace(".", ",").replace("_", ".")
+    )
+
+
+def _item(number: int, rng: random.Random) -> list[str]:
+    description = " ".join(
+        (
+            rng.choice(LINES),
+            rng.choice(VARIANTS),
+            rng.choice(KINDS),
+            f"{rng.choice(VOLUMES)}ML",
+        )
+    )
+    quantity = rng.randint(1, 24)
+    price = round(rng.uniform(19.9, 349.9), 2)
+    total = quantity * price
+
+    return [
+        str(100000 + number),
+        description,
+        "33030010",
+        "000",
+        "5405",
+        "UN",
+        f"{quantity},0000",
+        _brl(price),
+        _brl(total),
+        "0,00",
+        "0,00",
+        "0,00",
+        "0,00",
+        "0,00",
+    ]
+
+
+def access_key(number: int) -> str:
+    """Chave de acesso fictícia de 44 dígitos para a nota `number`"""
+    return f"4125{number:040d}"
+
+
+def _page_header(page: fitz.Page, number: int, pages: int, key: str):
+    page.insert_text((20, 30), "DANFE", fontsize=10)
+    page.insert_text((20, 44), "BOTICARIO PRODUTOS DE BELEZA LTDA", fontsize=6)
+    page.insert_text((420, 30), f"FOLHA {number}/{pages}", fontsize=6)
+    page.insert_text((300, 44), "CHAVE DE ACESSO", fontsize=5)
+    page.insert_text(
+        (300, 52),
+        " ".join(key[i : i + 4] for i in range(0, len(key), 4)),
+        fontsize=6,
+    )
+    page.insert_text((20, 80), "DADOS DOS PRODUTOS / SERVIÇOS", fontsize=5)
+
+    y = TABLE_TOP - 14
+    for (x, _), label in zip(COLUMNS, HEADER):
+        page.insert_text((x, y), label, fontsize=4)
+    page.insert_text((COLUMNS[12][0], y + 5), "IPI", fontsize=4)
+    page.insert_text((COLUMNS[13][0], y + 5), "ICMS", fontsize=4)
+
+
+def _page_footer(page: fitz.Page):
+    page.insert_text((20, 800), "DADOS ADICIONAIS", fontsize=5)
+    page.insert_text((300, 800), "RESERVADO AO FISCO", fontsize=5)
+
+
+def _render(
+    doc: fitz.Document,
+    invoice: tuple[int, int],
+    wrap_ratio: float,
+    rng: random.Random,
+    key: str,
+):
+    """Acrescenta ao documento as páginas de uma nota (itens, páginas)"""
+    items, pages = invoice
+    if pages < 1 or items < 0:
+        raise ValueError("Informe ao menos 1 página e 0 ou mais itens")
+
+    per_page = -(-items // pages)
+    if per_page > MAX_ROWS_PER_PAGE:
+        raise ValueError(
+            f"{items} itens não cabem em {pages} páginas "
+            f"(máximo de {MAX_ROWS_PER_PAGE} itens por página)"
+        )
+
+    number = 0
+
+    for page_number in range(1, pages + 1):
+        page = doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+        _page_header(page, page_number, pages, key)
+
+        y = TABLE_TOP
+        for _ in range(min(per_page, items - number)):
+            row = _item(number, rng)
+            wrap = rng.random() < wrap_ratio or (
+                fitz.get_text_length(row[1], fontsize=FONT_SIZE)
+                > COLUMNS[1][1]
+            )
+
+            for column, ((x, _), text) in enumerate(zip(COLUMNS, row)):
+                if column == 1 and wrap:
+                    first, _, rest = text.rpartition(" ")
+                    page.insert_text((x, y), first, fontsize=FONT_SIZE)
+                    page.insert_text(
+                        (x, y + WRAP_HEIGHT), rest, fontsize=FONT_SIZE
+                    )
+                else:
+                    page.insert_text((x, y), text, fontsize=FONT_SIZE)
+
+            y += ROW_HEIGHT + (WRAP_HEIGHT if wrap else 0)
+            number += 1
+
+        # O rodapé com o marcador de fim só aparece na última folha
+        if page_number == pages:
+            _page_footer(page)
+
+
+def generate(
+    items: int = 100,
+    pages: int = 1,
+    wrap_ratio: float = 0.0,
+    seed: int = 42,
+) -> bytes:
+    """
+    Gera o PDF de uma nota com `items` itens distribuídos igualmente em
+    `pages` páginas. Uma fração `wrap_ratio` das descrições é quebrada em
+    duas linhas, como acontece com descrições longas nas notas reais.
+    """
+    return generate_bundle([(items, pages)], wrap_ratio, seed)
+
+
+def generate_bundle(
+    invoices: list[tuple[int, int]],
+    wrap_ratio: float = 0.0,
+    seed: int = 42,
+) -> bytes:
+    """
+    Gera um único PDF com várias notas, uma para cada (itens, páginas),
+    cada uma com a própria chave de acesso.
+    """
+    rng = random.Random(seed)
+    doc = fitz.open()
+
+    for number, invoice in enumerate(invoices, start=1):
+        _render(doc, invoice, wrap_ratio, rng, access_key(number))
+
+    pdf = doc.tobytes(garbage=1, deflate=True)
+    doc.close()
+
+    return pdf
+
+
+def remove_header(pdf: bytes, page_number: int) -> bytes:
+    """
+    Apaga o cabeçalho da tabela de itens de uma página, como nas folhas de
+    continuação que não repetem o cabeçalho.
+    """
+    doc = fitz.open(stream=pdf, filetype="pdf")
+    page = doc[page_number]
+    page.add_redact_annot(
+        fitz.Rect(0, TABLE_TOP - 20, PAGE_WIDTH, TABLE_TOP - 6)
+    )
+    page.apply_redactions()
+
+    pdf = doc.tobytes(garbage=1, deflate=True)
+    doc.close()
+
+    return pdf
@@ -0,0 +1,48 @@
+import asyncio
+
+from app.manager.cache_manager import CacheManager
+
+
+def test_memory_entry_round_trip():
+    cache = CacheManager(1024)
+
+    asyncio.run(cache.set("a", {"nome": "Perfume"}))
+
+    assert asyncio.run(cache.get("a")) == {"nome": "Perfume"}
+    assert asyncio.run(cache.get("b")) is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_memory_evicts_least_recently_used():
+    cache = CacheManager(30)
+
+    asyncio.run(cache.set("a", "x" * 10))
+    asyncio.run(cache.set("b", "y" * 10))
+    asyncio.run(cache.get("a"))
+    asyncio.run(cache.set("c", "z" * 10))
+
+    assert cache.size <= 30
+    assert asyncio.run(cache.get("b")) is None
+
+
+def test_disk_entry_survives_restart(tmp_path):
+    cache = CacheManager(1024, str(tmp_path), 1024)
+    asyncio.run(cache.set("a", [1, 2, 3]))
+
+    restarted = CacheManager(1024, str(tmp_path), 1024)
+
+    assert restarted.disk_size == cache.disk_size
+    assert asyncio.run(restarted.get("a")) == [1, 2, 3]
+
+
+def test_disk_size_is_tracked_without_scanning(tmp_path):
+    cache = CacheManager(1024, str(tmp_path), 50)
+
+    for key in "abcde":
+        asyncio.run(cache.set(key, "x" * 10))
+    asyncio.run(cache.set("e", "x" * 5))
+
+    on_disk = sum(path.stat().st_size for path in tmp_path.iterdir())
+    assert cache.disk_size == on_disk
+    assert cache.disk_size <= 50
+    assert not (tmp_path / "a.json").exists()
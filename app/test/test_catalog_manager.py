@@ -0,0 +1,157 @@
+import asyncio
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime
+
+import pytest
+
+from app.controllers import file_controller
+from app.manager import catalog_manager as module
+from app.manager.catalog_manager import CatalogManager, _Catalog, _Snapshot
+from app.manager.sku_manager import SkuManager
+from app.modules import boticario
+
+Row = namedtuple("Row", "id nome marca_id atualizado_em")
+
+BRANDS = [("b", "O Boticário"), ("n", "Natura")]
+CATALOG = [
+    Row(1, "Malbec Desodorante Colônia 100ml", "b", datetime(2025, 1, 1)),
+    Row(2, "Egeo Dolce Desodorante Colônia 90ml", "b", datetime(2025, 1, 2)),
+    Row(3, "Kaiak Desodorante Colônia 100ml", "n", datetime(2025, 1, 3)),
+]
+
+
+def catalog() -> _Catalog:
+    return _Catalog({}, BRANDS).updated(CATALOG, BRANDS)
+
+
+def test_update_returns_new_snapshot_without_touching_the_old():
+    first = _Snapshot({}, {}, None).updated(CATALOG)
+    before = {gram: set(ids) for gram, ids in first.index.items()}
+    renamed = Row(
+        1, "Malbec Gold Desodorante Colônia 100ml", "b", CATALOG[1][3]
+    )
+
+    second = first.updated([renamed])
+
+    assert first.products[1]["nome"] == CATALOG[0].nome
+    assert {gram: set(ids) for gram, ids in first.index.items()} == before
+    assert second.products[1]["nome"] == renamed.nome
+    assert 1 in second.index["gol"]
+
+
+def test_concurrent_ensure_fresh_refreshes_once(monkeypatch):
+    manager = CatalogManager(refresh_interval=60)
+    calls = []
+
+    def build(current):
+        calls.append(1)
+        time.sleep(0.05)
+        return current.updated(CATALOG, BRANDS)
+
+    monkeypatch.setattr(CatalogManager, "_build", staticmethod(build))
+
+    async def scenario():
+        await asyncio.gather(*(manager.ensure_fresh() for _ in range(5)))
+
+    asyncio.run(scenario())
+
+    assert calls == [1]
+    assert manager.stats()["produtos"] == len(CATALOG)
+    assert manager.stats()["marcas"] == len(BRANDS)
+
+
+def test_match_reads_a_consistent_snapshot():
+    manager = CatalogManager(refresh_interval=60)
+    manager._catalog = catalog()
+
+    name, score = asyncio.run(
+        manager.match(boticario.BRAND, "MALBEC DES COL 100ML")
+    )
+
+    assert name == CATALOG[0].nome
+    assert 0 < score < 1
+
+
+def test_match_only_sees_products_of_the_brand():
+    manager = CatalogManager(refresh_interval=60)
+    manager._catalog = catalog()
+
+    ((name, score),) = asyncio.run(
+        manager.match_many(boticario.BRAND, [CATALOG[2].nome])
+    )
+
+    assert name in {row.nome for row in CATALOG if row.marca_id == "b"}
+    assert score < 1
+    assert asyncio.run(manager.match("Natura", CATALOG[2].nome)) == (
+        CATALOG[2].nome,
+        1.0,
+    )
+    assert asyncio.run(manager.match("Avon", CATALOG[2].nome)) is None
+
+
+def test_product_moved_to_another_brand_leaves_the_old_index():
+    moved = Row(3, CATALOG[2].nome, "b", datetime(2025, 1, 4))
+
+    updated = catalog().updated([moved], BRANDS)
+
+    assert 3 in updated.snapshots["b"].products
+    assert 3 not in updated.snapshots["n"].products
+    assert not any(3 in ids for ids in updated.snapshots["n"].index.values())
+
+
+def test_matching_runs_off_the_event_loop(monkeypatch):
+    manager = CatalogManager(refresh_interval=60)
+    manager._catalog = catalog()
+    threads = []
+    match_all = CatalogManager._match_all
+
+    def record(cls, snapshot, descriptions):
+        threads.append(threading.current_thread())
+        return match_all(snapshot, descriptions)
+
+    monkeypatch.setattr(
+        module.CatalogManager, "_match_all", classmethod(record)
+    )
+
+    asyncio.run(manager.match(boticario.BRAND, CATALOG[0].nome))
+
+    assert threads
+    assert threads[0] is not threading.main_thread()
+
+
+@pytest.fixture
+def naming(monkeypatch):
+    """Catálogo fixo, memória de SKUs sem banco e nenhum nome do LLM"""
+    manager = CatalogManager(refresh_interval=60)
+    manager._catalog = catalog()
+    manager.last_refresh = time.monotonic()
+    skus = SkuManager()
+
+    async def gen_names(products, brand, columns):
+        return {}
+
+    monkeypatch.setattr(
+        SkuManager, "_query_db", staticmethod(lambda brand, skus: {})
+    )
+    monkeypatch.setattr(file_controller, "catalog_manager", manager)
+    monkeypatch.setattr(file_controller, "sku_manager", skus)
+    monkeypatch.setattr(file_controller, "CATALOG_MATCH_THRESHOLD", 0.3)
+    monkeypatch.setattr(file_controller.gen, "gen_names", gen_names)
+    return skus
+
+
+def test_only_exact_catalog_matches_are_memoized(naming):
+    products = [
+        {"sku": "1", "descricao": "MALBEC DES COL 100ML"},
+        {"sku": "2", "descricao": CATALOG[1].nome},
+    ]
+
+    named, _ = asyncio.run(file_controller.name_products(boticario, products))
+
+    assert [product["nome"] for product in named] == [
+        CATALOG[0].nome,
+        CATALOG[1].nome,
+    ]
+    assert naming.names == {(boticario.BRAND, "2"): CATALOG[1].nome}
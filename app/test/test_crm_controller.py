@@ -0,0 +1,173 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+from app.controllers import crm_controller
+from app.gemini.gateway import LlmUnavailable
+from app.manager.flight_manager import FlightManager
+from app.manager.insight_manager import InsightManager
+
+NAME = "proxima-acao"
+
+
+class FakeGateway:
+    """
+    Gateway que conta as chamadas e devolve o JSON em duas partes, ou
+    levanta error quando definido
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.error = None
+
+    async def generate(self, contents, hedge=None):
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        if self.error:
+            raise self.error
+        return SimpleNamespace(text='{"acao": "repor"}')
+
+    async def stream(self, contents):
+        self.calls += 1
+        for text in ('{"acao": ', '"repor"}'):
+            await asyncio.sleep(0.01)
+            yield SimpleNamespace(text=text)
+
+
+def collect(name: str, periodo: str) -> dict:
+    return {"total": 1}
+
+
+def age(key: tuple, seconds: int):
+    """Envelhece a entrada do cache sem mexer no relógio do event loop"""
+    crm_controller.insight_manager.peek(key)["gerado_em"] -= seconds
+
+
+@pytest.fixture
+def crm(monkeypatch):
+    gateway = FakeGateway()
+    monkeypatch.setattr(crm_controller, "gateway", gateway)
+    monkeypatch.setattr(crm_controller, "flight_manager", FlightManager())
+    monkeypatch.setattr(
+        crm_controller, "insight_manager", InsightManager(60, 60, 8)
+    )
+    monkeypatch.setattr(crm_controller, "_collect", collect)
+    return gateway
+
+
+def _parse(chunks: list[str]) -> list[tuple]:
+    events = []
+    for chunk in chunks:
+        event, data = chunk.strip().split("\n")
+        events.append((event[7:], json.loads(data[6:])))
+    return events
+
+
+async def _read(name: str, bypass_cache: bool = False) -> list[tuple]:
+    content = await crm_controller.stream_insight(
+        name, bypass_cache=bypass_cache
+    )
+    return _parse([chunk async for chunk in content])
+
+
+def test_concurrent_streams_share_one_generation(crm):
+    async def scenario():
+        return await asyncio.gather(
+            _read(NAME),
+            _read(NAME),
+            crm_controller._insight(NAME, "mes_atual", False),
+        )
+
+    first, second, resultado = asyncio.run(scenario())
+
+    assert crm.calls == 1
+    assert first == second
+    assert [event for event, _ in first] == [
+        "dados",
+        "chunk",
+        "chunk",
+        "resultado",
+    ]
+    assert first[-1][1] == resultado == {"acao": "repor"}
+
+
+def test_stream_is_served_from_cache(crm):
+    async def scenario():
+        await _read(NAME)
+        return await _read(NAME)
+
+    events = asyncio.run(scenario())
+
+    assert crm.calls == 1
+    assert events == [("resultado", {"acao": "repor"})]
+
+
+def test_error_before_first_event_raises(crm, monkeypatch):
+    def collect(name, periodo):
+        raise RuntimeError("banco fora do ar")
+
+    monkeypatch.setattr(crm_controller, "_collect", collect)
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(_read(NAME))
+
+    assert error.value.status_code == 400
+    assert "banco fora do ar" in error.value.detail
+    assert crm.calls == 0
+
+
+def test_stale_entry_is_served_and_revalidated_once(crm, monkeypatch):
+    key = (NAME, "mes_atual")
+
+    async def scenario():
+        await crm_controller._insight(NAME, "mes_atual", False)
+        age(key, 90)
+        monkeypatch.setattr(
+            crm_controller, "_collect", lambda name, periodo: {"total": 2}
+        )
+        crm.calls = 0
+
+        served = await asyncio.gather(
+            *(
+                crm_controller._insight(NAME, "mes_atual", False)
+                for _ in range(3)
+            )
+        )
+        await asyncio.sleep(0.05)
+        return served
+
+    served = asyncio.run(scenario())
+
+    assert served == [{"acao": "repor"}] * 3
+    assert crm_controller.insight_manager.stale_hits == 3
+    assert crm.calls == 1
+    assert crm_controller.insight_manager.get(key)[1]
+
+
+def test_revalidation_with_same_data_skips_the_llm(crm):
+    key = (NAME, "mes_atual")
+
+    async def scenario():
+        await crm_controller._insight(NAME, "mes_atual", False)
+        age(key, 90)
+        await crm_controller._insight(NAME, "mes_atual", False)
+        await asyncio.sleep(0.05)
+
+    asyncio.run(scenario())
+
+    assert crm.calls == 1
+    assert crm_controller.insight_manager.revalidated == 1
+    assert crm_controller.insight_manager.get(key)[1]
+
+
+def test_unavailable_llm_answer_is_not_cached(crm):
+    crm.error = LlmUnavailable("circuito aberto")
+
+    resultado = asyncio.run(crm_controller._insight(NAME, "mes_atual", False))
+
+    assert resultado["indisponivel"]
+    assert resultado["dados"] == {"total": 1}
+    assert crm_controller.insight_manager.peek((NAME, "mes_atual")) is None
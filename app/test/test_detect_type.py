@@ -0,0 +1,26 @@
+import pytest
+
+from app.test.synthetic_invoice import generate, generate_bundle
+from app.utils import pdf_extraction
+
+
+@pytest.mark.parametrize("pages", [1, 2, 4])
+def test_invoice_is_detected_from_its_first_page(pages):
+    pdf = generate(30, pages)
+
+    assert pdf_extraction.detect_type(pdf) == "boticario"
+
+
+def test_bundle_is_detected_from_its_first_page():
+    pdf = generate_bundle([(30, 2), (10, 1)])
+
+    assert pdf_extraction.detect_type(pdf) == "boticario"
+
+
+def test_unknown_pdf_is_not_detected():
+    pdf = generate(30, 1)
+    doc = pdf_extraction.open_pdf(pdf)
+    doc.delete_page(0)
+    doc.insert_page(0, text="Outro fornecedor")
+
+    assert pdf_extraction.detect_type(doc.tobytes()) is None
@@ -0,0 +1,45 @@
+import asyncio
+
+import pytest
+
+from app.controllers import file_controller
+from app.manager.pool_manager import PoolManager
+from app.test.synthetic_invoice import generate, remove_header
+from app.utils import pdf_extraction
+
+TYPE = "boticario"
+
+
+@pytest.fixture
+def sharded(monkeypatch, tmp_path):
+    """Divide qualquer PDF com 2 páginas ou mais entre 2 processos"""
+    pool = PoolManager(2)
+    monkeypatch.setattr(file_controller, "pool_manager", pool)
+    monkeypatch.setattr(file_controller, "PDF_PARALLEL_PAGE_THRESHOLD", 2)
+    monkeypatch.setattr(file_controller.path_manager, "path_pdf", tmp_path)
+    yield tmp_path
+    pool.shutdown()
+
+
+def test_sharded_extraction_matches_single_pass(sharded):
+    pdf = generate(90, 6, wrap_ratio=0.3)
+
+    products = asyncio.run(file_controller.extract_products(TYPE, pdf))
+
+    assert products == pdf_extraction.extract_text(TYPE, pdf)
+
+
+def test_sharded_extraction_removes_spilled_copy(sharded):
+    pdf = generate(30, 3)
+
+    asyncio.run(file_controller.extract_products(TYPE, pdf))
+
+    assert not list(sharded.iterdir())
+
+
+def test_headerless_shard_falls_back_to_single_pass(sharded):
+    pdf = remove_header(generate(60, 3), 2)
+
+    products = asyncio.run(file_controller.extract_products(TYPE, pdf))
+
+    assert len(products) == 60
@@ -0,0 +1,74 @@
+import asyncio
+
+import pytest
+
+from app.manager.flight_manager import FlightManager
+
+KEY = ("proxima-acao", "mes_atual", False)
+
+
+async def _collect(events) -> list:
+    return [event async for event in events]
+
+
+def test_concurrent_calls_share_one_execution():
+    manager = FlightManager()
+    calls = []
+
+    async def fn(publish):
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "ok"
+
+    async def scenario():
+        return await asyncio.gather(*(manager.do(KEY, fn) for _ in range(5)))
+
+    assert asyncio.run(scenario()) == ["ok"] * 5
+    assert calls == [1]
+    assert manager.stats() == {
+        "execucoes": 1,
+        "compartilhadas": 4,
+        "em_andamento": 0,
+    }
+
+
+def test_late_subscriber_receives_every_event():
+    manager = FlightManager()
+
+    async def fn(publish):
+        for i in range(4):
+            publish(i)
+            await asyncio.sleep(0.01)
+        return "ok"
+
+    async def scenario():
+        first = asyncio.create_task(_collect(manager.subscribe(KEY, fn)))
+        await asyncio.sleep(0.025)
+        late = asyncio.create_task(_collect(manager.subscribe(KEY, fn)))
+        result = await manager.do(KEY, fn)
+        return await first, await late, result
+
+    first, late, result = asyncio.run(scenario())
+
+    assert first == late == [0, 1, 2, 3]
+    assert result == "ok"
+    assert manager.leaders == 1
+
+
+def test_subscriber_receives_execution_error():
+    manager = FlightManager()
+
+    async def fn(publish):
+        publish("dados")
+        raise RuntimeError("falha")
+
+    received = []
+
+    async def scenario():
+        async for event in manager.subscribe(KEY, fn):
+            received.append(event)
+
+    with pytest.raises(RuntimeError, match="falha"):
+        asyncio.run(scenario())
+
+    assert received == ["dados"]
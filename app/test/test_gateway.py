@@ -0,0 +1,350 @@
+import asyncio
+from collections import deque
+from types import SimpleNamespace
+
+import pytest
+from google.genai import errors
+
+from app.gemini import gateway as module
+from app.gemini.gateway import (
+    LlmGateway,
+    LlmUnavailable,
+    _AdaptiveLimit,
+    _CircuitBreaker,
+    _TokenBucket,
+)
+
+RESPONSE = SimpleNamespace(text='{"ok": true}', usage_metadata=None)
+
+
+def api_error(code: int) -> errors.APIError:
+    return errors.APIError(code, {"error": {"message": "falha"}})
+
+
+class FakeModels:
+    """
+    generate_content que devolve (ou levanta) os resultados na ordem,
+    depois das demoras em delays ou, sem elas, de delay segundos
+    """
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.delays = []
+        self.delay = 0
+        self.calls = 0
+        self.cancelled = 0
+
+    async def generate_content(self, model, contents, config=None):
+        self.calls += 1
+        outcome = self.outcomes.pop(0) if self.outcomes else RESPONSE
+        try:
+            delay = self.delays.pop(0) if self.delays else self.delay
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+@pytest.fixture
+def models(monkeypatch):
+    models = FakeModels()
+    client = SimpleNamespace(aio=SimpleNamespace(models=models))
+    provider = SimpleNamespace(get=lambda: client)
+    monkeypatch.setattr(module, "provider", provider)
+    monkeypatch.setattr(module, "LLM_RETRY_BASE_MS", 0)
+    return models
+
+
+@pytest.fixture
+def gateway(models) -> LlmGateway:
+    gateway = LlmGateway()
+    gateway.breaker = _CircuitBreaker(failures=2, reset_seconds=0)
+    gateway.attempts = 1
+    gateway.hedge_rate = 0
+    return gateway
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Relógio controlado pelo teste no lugar de time.monotonic"""
+    now = [1000.0]
+    monkeypatch.setattr(module.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_breaker_opens_after_consecutive_failures(clock):
+    breaker = _CircuitBreaker(failures=2, reset_seconds=10)
+
+    breaker.record(False)
+    assert breaker.allow()
+    breaker.record(False)
+
+    assert breaker.state == breaker.OPEN
+    assert not breaker.allow()
+    assert breaker.openings == 1
+
+
+def test_breaker_half_open_allows_a_single_probe(clock):
+    breaker = _CircuitBreaker(failures=1, reset_seconds=10)
+    breaker.record(False)
+
+    clock[0] += 10
+
+    assert breaker.allow()
+    assert breaker.state == breaker.HALF_OPEN
+    assert not breaker.allow()
+
+
+def test_breaker_probe_success_closes(clock):
+    breaker = _CircuitBreaker(failures=1, reset_seconds=10)
+    breaker.record(False)
+    clock[0] += 10
+    breaker.allow()
+
+    breaker.record(True)
+
+    assert breaker.state == breaker.CLOSED
+    assert breaker.failures == 0
+    assert breaker.allow()
+
+
+def test_breaker_probe_failure_reopens(clock):
+    breaker = _CircuitBreaker(failures=3, reset_seconds=10)
+    for _ in range(3):
+        breaker.record(False)
+    clock[0] += 10
+    breaker.allow()
+
+    breaker.record(False)
+
+    assert breaker.state == breaker.OPEN
+    assert not breaker.allow()
+
+
+def test_breaker_ignores_calls_without_outcome(clock):
+    breaker = _CircuitBreaker(failures=1, reset_seconds=10)
+    breaker.record(False)
+    clock[0] += 10
+    breaker.allow()
+
+    breaker.record(None)
+
+    assert breaker.state == breaker.HALF_OPEN
+    assert breaker.allow()
+
+
+def test_gateway_rejects_while_circuit_is_open(gateway, models):
+    gateway.breaker.reset_seconds = 60
+    models.outcomes = [api_error(503), api_error(503)]
+
+    for _ in range(2):
+        with pytest.raises(errors.APIError):
+            asyncio.run(gateway.generate("prompt"))
+
+    with pytest.raises(LlmUnavailable):
+        asyncio.run(gateway.generate("prompt"))
+
+    assert models.calls == 2
+    assert gateway.rejected["circuito"] == 1
+
+
+def test_client_errors_do_not_trip_the_breaker(gateway, models):
+    models.outcomes = [api_error(400)] * 5
+
+    for _ in range(5):
+        with pytest.raises(errors.APIError):
+            asyncio.run(gateway.generate("prompt"))
+
+    assert gateway.breaker.state == gateway.breaker.CLOSED
+    assert gateway.breaker.failures == 0
+
+
+def test_client_error_keeps_half_open_probe_pending(gateway, models):
+    gateway.breaker.record(False)
+    gateway.breaker.record(False)
+    models.outcomes = [api_error(400)]
+
+    with pytest.raises(errors.APIError):
+        asyncio.run(gateway.generate("prompt"))
+
+    assert gateway.breaker.state == gateway.breaker.HALF_OPEN
+    assert asyncio.run(gateway.generate("prompt")) is RESPONSE
+    assert gateway.breaker.state == gateway.breaker.CLOSED
+
+
+def test_retry_recovers_from_temporary_errors(gateway, models):
+    gateway.attempts = 3
+    models.outcomes = [api_error(503), api_error(429)]
+
+    assert asyncio.run(gateway.generate("prompt")) is RESPONSE
+    assert models.calls == 3
+    assert gateway.retries == 2
+    assert gateway.breaker.failures == 0
+
+
+def test_retry_gives_up_after_last_attempt(gateway, models):
+    gateway.attempts = 2
+    models.outcomes = [api_error(503)] * 3
+
+    with pytest.raises(errors.APIError):
+        asyncio.run(gateway.generate("prompt"))
+
+    assert models.calls == 2
+    assert gateway.breaker.failures == 1
+
+
+def test_client_error_is_not_retried(gateway, models):
+    gateway.attempts = 3
+    models.outcomes = [api_error(400)]
+
+    with pytest.raises(errors.APIError):
+        asyncio.run(gateway.generate("prompt"))
+
+    assert models.calls == 1
+    assert gateway.retries == 0
+
+
+def test_overload_halves_the_limit(gateway, models):
+    gateway.limit = _AdaptiveLimit(initial=8, maximum=32)
+    models.outcomes = [api_error(429)]
+
+    with pytest.raises(errors.APIError):
+        asyncio.run(gateway.generate("prompt"))
+
+    assert gateway.limit.limit == 4
+
+
+def test_success_grows_the_limit_additively(gateway):
+    gateway.limit = _AdaptiveLimit(initial=4, maximum=32)
+
+    for _ in range(4):
+        asyncio.run(gateway.generate("prompt"))
+
+    assert 4.9 < gateway.limit.limit < 5
+    assert gateway.limit.in_flight == 0
+
+
+def test_limit_never_drops_below_one():
+    limit = _AdaptiveLimit(initial=2, maximum=8)
+
+    for _ in range(5):
+        limit.decrease()
+
+    assert limit.limit == 1
+
+
+def test_waiter_gets_the_released_slot():
+    limit = _AdaptiveLimit(initial=1, maximum=1)
+
+    async def scenario():
+        await limit.acquire(1)
+        waiter = asyncio.create_task(limit.acquire(1))
+        await asyncio.sleep(0)
+        assert limit.waiting == 1
+        limit.release()
+        await waiter
+
+    asyncio.run(scenario())
+
+    assert limit.in_flight == 1
+    assert limit.waiting == 0
+
+
+def test_queue_timeout_rejects_the_call(gateway, models):
+    gateway.limit = _AdaptiveLimit(initial=1, maximum=1)
+    gateway.queue_timeout = 0.01
+    gateway.limit.in_flight = 1
+
+    with pytest.raises(LlmUnavailable):
+        asyncio.run(gateway.generate("prompt"))
+
+    assert models.calls == 0
+    assert gateway.rejected["fila"] == 1
+
+
+def test_token_bucket_waits_for_refill():
+    bucket = _TokenBucket(per_minute=600)
+
+    async def scenario():
+        await bucket.take(600, module.time.monotonic() + 1)
+        started = module.time.monotonic()
+        await bucket.take(1, module.time.monotonic() + 1)
+        return module.time.monotonic() - started
+
+    assert asyncio.run(scenario()) >= 0.09
+
+
+def test_token_bucket_rejects_past_the_deadline():
+    bucket = _TokenBucket(per_minute=60)
+
+    async def scenario():
+        await bucket.take(60, module.time.monotonic() + 1)
+        await bucket.take(30, module.time.monotonic() + 1)
+
+    with pytest.raises(LlmUnavailable):
+        asyncio.run(scenario())
+
+
+def test_token_bucket_adjusts_to_real_usage(clock):
+    bucket = _TokenBucket(per_minute=100)
+    bucket.tokens = 50
+
+    bucket.adjust(20)
+    assert bucket.tokens == 30
+
+    bucket.adjust(-200)
+    assert bucket.tokens == 100
+
+
+def test_disabled_token_bucket_never_waits():
+    bucket = _TokenBucket(per_minute=0)
+
+    asyncio.run(bucket.take(10**9, 0))
+
+    assert bucket.tokens == 0
+
+
+@pytest.fixture
+def hedging(gateway, monkeypatch) -> LlmGateway:
+    """Cópia depois de 10 ms, a partir das latências já registradas"""
+    monkeypatch.setattr(module, "LLM_HEDGE_MIN_SAMPLES", 1)
+    gateway.hedge_rate = 0.25
+    gateway._hedge_latencies["prompt"] = deque([0.01] * 200, maxlen=1000)
+    return gateway
+
+
+def test_hedge_copy_wins_and_loser_is_awaited(hedging, models):
+    hedging._hedge_credit = 1
+    models.delays = [1.0]
+
+    async def scenario():
+        response = await hedging.generate("prompt", hedge="prompt")
+        # A chamada perdedora já terminou quando a resposta é devolvida
+        return response, models.cancelled, hedging.limit.in_flight
+
+    assert asyncio.run(scenario()) == (RESPONSE, 1, 0)
+    assert hedging.hedges == 1
+    assert hedging.hedge_wins == 1
+
+
+def test_hedge_rate_holds_after_calls_without_copy(hedging, models):
+    for _ in range(40):
+        asyncio.run(hedging.generate("prompt", hedge="prompt"))
+    assert hedging.hedges == 0
+
+    models.delay = 0.03
+    for _ in range(8):
+        asyncio.run(hedging.generate("prompt", hedge="prompt"))
+
+    assert hedging.hedges == 2
+
+
+def test_no_hedge_while_calls_are_queued(hedging):
+    hedging._hedge_credit = 1
+    hedging.limit._waiters.append(None)
+
+    assert not hedging._may_hedge()
+    assert hedging._hedge_credit == 1
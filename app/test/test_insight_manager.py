@@ -0,0 +1,120 @@
+import asyncio
+
+import pytest
+
+from app.manager import insight_manager as module
+from app.manager.insight_manager import InsightManager, fingerprint
+
+KEY = ("proxima-acao", "mes_atual")
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Relógio controlado pelo teste no lugar de time.monotonic"""
+    now = [1000.0]
+    monkeypatch.setattr(module.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_entry_is_fresh_within_ttl(clock):
+    manager = InsightManager(ttl=10, max_stale=20, max_entries=8)
+    manager.set(KEY, {"a": 1}, "fp")
+
+    clock[0] += 10
+    entry, fresh = manager.get(KEY)
+
+    assert entry["valor"] == {"a": 1}
+    assert fresh
+    assert manager.hits == 1
+
+
+def test_entry_is_stale_after_ttl(clock):
+    manager = InsightManager(ttl=10, max_stale=20, max_entries=8)
+    manager.set(KEY, {"a": 1}, "fp")
+
+    clock[0] += 11
+    entry, fresh = manager.get(KEY)
+
+    assert entry["valor"] == {"a": 1}
+    assert not fresh
+    assert manager.stale_hits == 1
+
+
+def test_entry_expires_after_max_stale(clock):
+    manager = InsightManager(ttl=10, max_stale=20, max_entries=8)
+    manager.set(KEY, {"a": 1}, "fp")
+
+    clock[0] += 31
+    entry, fresh = manager.get(KEY)
+
+    assert entry is None
+    assert not fresh
+    assert manager.misses == 1
+
+
+def test_touch_renews_entry(clock):
+    manager = InsightManager(ttl=10, max_stale=20, max_entries=8)
+    manager.set(KEY, {"a": 1}, "fp")
+
+    clock[0] += 15
+    manager.touch(KEY)
+    _, fresh = manager.get(KEY)
+
+    assert fresh
+    assert manager.revalidated == 1
+
+
+def test_least_recently_used_entry_is_evicted():
+    manager = InsightManager(ttl=10, max_stale=20, max_entries=2)
+    manager.set(("a",), 1, "fp")
+    manager.set(("b",), 2, "fp")
+    manager.get(("a",))
+    manager.set(("c",), 3, "fp")
+
+    assert manager.peek(("a",)) is not None
+    assert manager.peek(("b",)) is None
+    assert manager.peek(("c",)) is not None
+
+
+def test_revalidate_runs_once_per_key():
+    manager = InsightManager(ttl=10, max_stale=20, max_entries=8)
+    calls = []
+
+    async def refresh():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+
+    async def scenario():
+        for _ in range(5):
+            manager.revalidate(KEY, refresh)
+        assert manager.stats()["atualizando"] == 1
+        await asyncio.sleep(0.05)
+
+    asyncio.run(scenario())
+
+    assert calls == [1]
+    assert manager.stats()["atualizando"] == 0
+
+
+def test_revalidate_counts_errors():
+    manager = InsightManager(ttl=10, max_stale=20, max_entries=8)
+
+    async def refresh():
+        raise RuntimeError("falha")
+
+    async def scenario():
+        manager.revalidate(KEY, refresh)
+        await asyncio.sleep(0.01)
+
+    asyncio.run(scenario())
+
+    assert manager.refresh_errors == 1
+
+
+def test_fingerprint_ignores_period_bounds():
+    first = {"resumo": {"total": 10, "periodo": {"inicio": "2025-01-01"}}}
+    second = {"resumo": {"total": 10, "periodo": {"inicio": "2025-01-02"}}}
+    changed = {"resumo": {"total": 11, "periodo": {"inicio": "2025-01-01"}}}
+
+    assert fingerprint(first) == fingerprint(second)
+    assert fingerprint(first) != fingerprint(changed)
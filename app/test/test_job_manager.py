@@ -0,0 +1,49 @@
+import asyncio
+
+from app.manager.job_manager import JobManager
+
+
+def test_cleanup_runs_after_the_job():
+    cleaned = []
+
+    async def fn(value):
+        return value
+
+    async def scenario():
+        manager = JobManager(workers=1, queue_size=1, retention=60)
+        manager.start()
+        job = manager.submit(fn, "ok", cleanup=lambda: cleaned.append(1))
+        await manager._queue.join()
+        await manager.stop()
+        return job
+
+    job = asyncio.run(scenario())
+
+    assert job["status"] == "concluido"
+    assert job["resultado"] == "ok"
+    assert cleaned == [1]
+
+
+def test_stop_cleans_up_queued_jobs():
+    cleaned = []
+
+    async def scenario():
+        running = asyncio.Event()
+
+        async def slow(_):
+            running.set()
+            await asyncio.sleep(10)
+
+        manager = JobManager(workers=1, queue_size=3, retention=60)
+        manager.start()
+        for name in ("a", "b", "c"):
+            manager.submit(
+                slow, name, cleanup=lambda name=name: cleaned.append(name)
+            )
+        await running.wait()
+        await manager.stop()
+
+    asyncio.run(scenario())
+
+    # "a" foi interrompido no meio; "b" e "c" nem chegaram a rodar
+    assert sorted(cleaned) == ["a", "b", "c"]
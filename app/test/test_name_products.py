@@ -0,0 +1,138 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+from google.genai import errors
+
+from app.controllers import file_controller
+from app.gemini import gen
+from app.gemini.gateway import LlmUnavailable
+from app.manager.cache_manager import CacheManager
+from app.manager.sku_manager import SkuManager
+from app.modules import boticario
+
+TYPE = "boticario"
+
+
+def products() -> list[dict]:
+    return [
+        {"sku": sku, "nome": f"DESC {sku}", "descricao": f"DESC {sku}"}
+        for sku in ("1", "2")
+    ]
+
+
+class FakeProducts:
+    def __init__(self):
+        self.calls = []
+
+    async def persist(self, products, brand, key):
+        self.calls.append(products)
+
+
+@pytest.fixture
+def ingestion(monkeypatch):
+    async def ensure_fresh():
+        pass
+
+    async def match_many(brand, descriptions):
+        return [None] * len(descriptions)
+
+    sku_manager = SkuManager()
+    monkeypatch.setattr(sku_manager, "_query_db", lambda brand, skus: {})
+    monkeypatch.setattr(file_controller, "sku_manager", sku_manager)
+    monkeypatch.setattr(
+        file_controller,
+        "catalog_manager",
+        SimpleNamespace(
+            ensure_fresh=ensure_fresh,
+            match_many=match_many,
+        ),
+    )
+    monkeypatch.setattr(
+        file_controller, "cache_manager", CacheManager(1 << 20)
+    )
+    monkeypatch.setattr(file_controller, "product_manager", FakeProducts())
+
+    async def extract_products(type, pdf):
+        return products()
+
+    monkeypatch.setattr(file_controller, "extract_products", extract_products)
+    return sku_manager
+
+
+@pytest.fixture(
+    params=[
+        LlmUnavailable("circuito aberto"),
+        errors.APIError(503, {"error": {"message": "sobrecarga"}}),
+        errors.APIError(429, {"error": {"message": "cota"}}),
+    ],
+    ids=["recusada", "503", "429"],
+)
+def unavailable(request, monkeypatch):
+    """Gateway que falha como o Gemini fora do ar, após as retentativas"""
+
+    async def generate(contents, config=None):
+        raise request.param
+
+    monkeypatch.setattr(gen.gateway, "generate", generate)
+
+
+@pytest.fixture
+def available(monkeypatch):
+    async def gen_names(products, brand, columns):
+        return {p["sku"]: f"Nome {p['sku']}" for p in products}
+
+    monkeypatch.setattr(gen, "gen_names", gen_names)
+
+
+def test_unnamed_products_are_marked_pending(ingestion, unavailable):
+    named, complete = asyncio.run(
+        file_controller.name_products(boticario, products())
+    )
+
+    assert not complete
+    assert all(product["nomePendente"] for product in named)
+    assert [product["nome"] for product in named] == ["DESC 1", "DESC 2"]
+    assert not ingestion.names
+
+
+def test_named_products_are_not_pending(ingestion, available):
+    named, complete = asyncio.run(
+        file_controller.name_products(boticario, products())
+    )
+
+    assert complete
+    assert not any(product["nomePendente"] for product in named)
+    assert ingestion.names[(boticario.BRAND, "1")] == "Nome 1"
+
+
+def test_pending_names_are_not_persisted(ingestion, unavailable):
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(file_controller.process_pdf(TYPE, b"%PDF", persist=True))
+
+    assert error.value.status_code == 503
+    assert not file_controller.product_manager.calls
+    assert not file_controller.cache_manager.stats()["itens"]
+
+
+def test_named_products_are_persisted(ingestion, available, monkeypatch):
+    monkeypatch.setattr(
+        file_controller.pdf_extraction, "access_key", lambda pdf: "chave"
+    )
+
+    asyncio.run(file_controller.process_pdf(TYPE, b"%PDF", persist=True))
+
+    assert len(file_controller.product_manager.calls) == 1
+
+
+def test_client_error_still_fails_the_request(ingestion, monkeypatch):
+    async def generate(contents, config=None):
+        raise errors.APIError(400, {"error": {"message": "prompt inválido"}})
+
+    monkeypatch.setattr(gen.gateway, "generate", generate)
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(file_controller.name_products(boticario, products()))
+
+    assert error.value.status_code == 400
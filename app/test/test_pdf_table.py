@@ -0,0 +1,96 @@
+import fitz
+import pytest
+
+from app.modules import boticario
+from app.test import synthetic_invoice
+from app.test.synthetic_invoice import (
+    generate,
+    generate_bundle,
+    remove_header,
+)
+from app.utils import pdf_extraction
+
+TYPE = "boticario"
+
+
+def test_rows_have_all_columns():
+    rows, _, ended = pdf_extraction.extract_pages(TYPE, generate(20, 1))
+
+    assert ended
+    assert len(rows) == 20
+    assert all(len(row) == len(boticario.HEADER) for row in rows)
+
+
+def test_wrapped_descriptions_stay_in_one_cell():
+    pdf = generate(30, 1, wrap_ratio=1)
+
+    rows, _, _ = pdf_extraction.extract_pages(TYPE, pdf)
+
+    assert len(rows) == 30
+    assert all(len(row[1].split()) >= 4 for row in rows)
+
+
+def test_multi_page_invoice_keeps_every_item():
+    pdf = generate(120, 4, wrap_ratio=0.2)
+    products = pdf_extraction.extract_text(TYPE, pdf)
+
+    assert len(products) == 120
+    assert all(product["quantidade"] > 0 for product in products)
+
+
+def test_page_range_extracts_only_those_pages():
+    pdf = generate(40, 4)
+
+    rows, leading, ended = pdf_extraction.extract_pages(TYPE, pdf, 1, 3)
+
+    assert len(rows) == 20
+    assert leading == 0
+    assert not ended
+
+
+def test_blank_cell_keeps_row_and_columns():
+    doc = fitz.open(stream=generate(20, 1), filetype="pdf")
+    page = doc[0]
+    x, width = synthetic_invoice.COLUMNS[10]
+    top = synthetic_invoice.TABLE_TOP
+    page.add_redact_annot(fitz.Rect(x, top - 6, x + width, top + 2))
+    page.apply_redactions()
+
+    rows, _, _ = pdf_extraction.extract_pages(TYPE, doc.tobytes())
+
+    assert len(rows) == 20
+    assert not rows[0][10]
+    assert all(row[10] for row in rows[1:])
+
+
+def test_reading_stops_at_end_marker():
+    pdf = generate_bundle([(10, 1), (15, 2)])
+
+    products = pdf_extraction.extract_text(TYPE, pdf)
+
+    assert len(products) == 10
+
+
+def test_page_without_header_continues_the_table():
+    pdf = remove_header(generate(60, 3), 1)
+
+    products = pdf_extraction.extract_text(TYPE, pdf)
+
+    assert len(products) == 60
+
+
+def test_missing_end_marker_raises():
+    pdf = generate(40, 4)
+
+    with pytest.raises(ValueError, match="Fim da tabela"):
+        pdf_extraction.extract_text(TYPE, pdf, 0, 3)
+
+
+def test_join_requests_single_pass_for_headerless_shard():
+    pdf = remove_header(generate(60, 3), 2)
+    parts = [
+        pdf_extraction.extract_pages(TYPE, pdf, start, stop)
+        for start, stop in pdf_extraction.shard_pages(3, 2)
+    ]
+
+    assert pdf_extraction.join_pages(parts) is None
@@ -0,0 +1,172 @@
+"""
+Gravação dos produtos no Postgres. Roda só com TEST_DATABASE_URL definida,
+apontando para um banco descartável: as tabelas são recriadas a cada teste.
+
+    TEST_DATABASE_URL=postgresql://postgres@localhost:5433/postgres task test
+"""
+
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+from sqlalchemy import create_engine, select, text
+from sqlalchemy.orm import sessionmaker
+
+from app.controllers import file_controller
+from app.db.database import Base
+from app.db.models import Marca, NotaProcessada, Produto
+from app.manager import product_manager as module
+from app.manager.cache_manager import CacheManager
+from app.manager.product_manager import ProductManager
+from app.modules import boticario
+from app.test.synthetic_invoice import generate
+
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
+MIGRATIONS = Path(__file__).parents[2] / "migrations"
+
+pytestmark = pytest.mark.skipif(
+    not TEST_DATABASE_URL, reason="TEST_DATABASE_URL não definida"
+)
+
+TYPE = "boticario"
+
+
+def product(sku: str, quantity) -> dict:
+    return {
+        "sku": sku,
+        "nome": sku,
+        "descricao": sku,
+        "quantidade": quantity,
+        "precoUnitario": 10.0,
+        "valorVenda": 10.0,
+        "tag": boticario.TAG,
+        "catalogo": True,
+    }
+
+
+@pytest.fixture
+def database(monkeypatch):
+    engine = create_engine(TEST_DATABASE_URL)
+    Base.metadata.drop_all(engine)
+    # nota_processada vem da migração, como em produção
+    Base.metadata.create_all(
+        engine, tables=[Marca.__table__, Produto.__table__]
+    )
+    with engine.begin() as connection:
+        for migration in sorted(MIGRATIONS.glob("*.sql")):
+            connection.execute(text(migration.read_text(encoding="utf-8")))
+
+    Session = sessionmaker(bind=engine)
+    with Session() as db, db.begin():
+        db.add(Marca(nome="O Boticário"))
+
+    monkeypatch.setattr(module, "SessionLocal", Session)
+    yield Session
+
+    Base.metadata.drop_all(engine)
+    engine.dispose()
+
+
+def stock(Session) -> dict[str, int]:
+    with Session() as db:
+        rows = db.execute(select(Produto.sku, Produto.quantidade)).all()
+    return dict(rows)
+
+
+def test_same_pdf_twice_increments_stock_once(database, monkeypatch):
+    async def name_products(module, products):
+        return products, True
+
+    manager = ProductManager()
+    monkeypatch.setattr(file_controller, "product_manager", manager)
+    monkeypatch.setattr(file_controller, "name_products", name_products)
+    monkeypatch.setattr(file_controller, "cache_manager", CacheManager(2**20))
+    pdf = generate(10, 1)
+
+    first = asyncio.run(file_controller.process_pdf(TYPE, pdf, persist=True))
+    before = stock(database)
+    asyncio.run(file_controller.process_pdf(TYPE, pdf, persist=True))
+    asyncio.run(
+        file_controller.process_pdf(TYPE, pdf, bypass_cache=True, persist=True)
+    )
+
+    assert sum(before.values()) == sum(p["quantidade"] for p in first)
+    assert stock(database) == before
+    assert manager.stats()["notas_repetidas"] == 2
+
+
+def test_each_invoice_is_added_once(database):
+    manager = ProductManager()
+
+    asyncio.run(manager.persist([product("a", 2)], "Boticário", "nota-1"))
+    asyncio.run(manager.persist([product("a", 3)], "Boticário", "nota-2"))
+    result = asyncio.run(
+        manager.persist([product("a", 3)], "Boticário", "nota-2")
+    )
+
+    assert result["repetida"]
+    assert stock(database) == {"a": 5}
+
+    with database() as db:
+        brand = db.execute(select(Marca.id)).scalar()
+        assert db.execute(select(Produto.marca_id)).scalar() == brand
+        assert db.query(NotaProcessada).count() == 2
+
+
+def test_concurrent_invoices_insert_a_new_sku_once(database):
+    manager = ProductManager()
+
+    def persist(number: int):
+        return manager._upsert(
+            [product("novo", 1), product(f"outro-{number}", 1)],
+            "Boticário",
+            f"nota-{number}",
+        )
+
+    with ThreadPoolExecutor(8) as executor:
+        list(executor.map(persist, range(8)))
+
+    assert stock(database)["novo"] == 8
+
+
+def test_unknown_brand_fails(database):
+    manager = ProductManager()
+
+    with pytest.raises(ValueError, match="Marca Natura"):
+        asyncio.run(manager.persist([product("a", 1)], "Natura", "nota-1"))
+
+    assert stock(database) == {}
+
+
+def test_fractional_quantity_fails(database):
+    manager = ProductManager()
+
+    with pytest.raises(ValueError, match="fracionária"):
+        asyncio.run(
+            manager.persist([product("a", 1.5)], "Boticário", "nota-1")
+        )
+
+    assert stock(database) == {}
+
+
+def test_same_sku_of_another_brand_is_left_alone(database):
+    with database() as db, db.begin():
+        natura = Marca(nome="Natura")
+        db.add(natura)
+        db.flush()
+        db.add(Produto(nome="a", sku="a", quantidade=7, marca_id=natura.id))
+        natura_id = natura.id
+
+    manager = ProductManager()
+    result = asyncio.run(
+        manager.persist([product("a", 2)], "Boticário", "nota-1")
+    )
+
+    assert result["inseridos"] == 1
+    assert result["atualizados"] == 0
+    with database() as db:
+        rows = db.execute(select(Produto.marca_id, Produto.quantidade)).all()
+    assert sorted(quantity for _, quantity in rows) == [2, 7]
+    assert (natura_id, 7) in rows
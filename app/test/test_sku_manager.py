@@ -0,0 +1,57 @@
+import asyncio
+import json
+
+import pytest
+
+from app.manager.sku_manager import SkuManager
+
+
+@pytest.fixture(autouse=True)
+def no_database(monkeypatch):
+    """A memória é testada sem o banco: nenhum SKU vem da tabela produto"""
+    monkeypatch.setattr(
+        SkuManager, "_query_db", staticmethod(lambda brand, skus: {})
+    )
+
+
+def test_names_are_keyed_by_brand():
+    manager = SkuManager()
+    asyncio.run(manager.remember("Boticário", {"123": "Malbec"}))
+
+    assert asyncio.run(manager.resolve("Boticário", ["123"])) == {
+        "123": "Malbec"
+    }
+    assert asyncio.run(manager.resolve("Natura", ["123"])) == {}
+
+
+def test_least_recently_used_name_is_dropped():
+    manager = SkuManager(max_entries=2)
+    asyncio.run(manager.remember("Boticário", {"1": "a", "2": "b"}))
+    asyncio.run(manager.resolve("Boticário", ["1"]))
+    asyncio.run(manager.remember("Boticário", {"3": "c"}))
+
+    assert set(manager.names) == {("Boticário", "1"), ("Boticário", "3")}
+
+
+def test_memo_file_survives_restart(tmp_path):
+    path = str(tmp_path / "skus.json")
+    manager = SkuManager(path)
+
+    async def scenario():
+        await asyncio.gather(
+            manager.remember("Boticário", {"1": "a"}),
+            manager.remember("Natura", {"1": "b"}),
+        )
+
+    asyncio.run(scenario())
+    restarted = SkuManager(path)
+
+    assert restarted.names == manager.names
+    assert not [p for p in tmp_path.iterdir() if p.suffix == ".tmp"]
+
+
+def test_memo_file_without_brand_is_ignored(tmp_path):
+    path = tmp_path / "skus.json"
+    path.write_text(json.dumps({"123": "Malbec"}))
+
+    assert not SkuManager(str(path)).names
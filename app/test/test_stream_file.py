@@ -0,0 +1,79 @@
+import asyncio
+import io
+import json
+import os
+
+import pytest
+from fastapi import UploadFile
+
+from app.controllers import file_controller
+from app.test.synthetic_invoice import generate_bundle
+
+TYPE = "boticario"
+
+
+class InlinePool:
+    """Executa no próprio processo e guarda os argumentos de cada chamada"""
+
+    max_workers = 1
+
+    def __init__(self):
+        self.calls = []
+
+    async def run(self, fn, *args):
+        self.calls.append((fn.__name__, args))
+        return fn(*args)
+
+
+@pytest.fixture
+def pool(monkeypatch, tmp_path):
+    async def name_products(module, products):
+        return products, True
+
+    pool = InlinePool()
+    monkeypatch.setattr(file_controller, "pool_manager", pool)
+    monkeypatch.setattr(file_controller, "name_products", name_products)
+    monkeypatch.setattr(file_controller.path_manager, "path_pdf", tmp_path)
+    return pool
+
+
+def upload(pdf: bytes) -> UploadFile:
+    return UploadFile(io.BytesIO(pdf), filename="lote.pdf", size=len(pdf))
+
+
+async def collect(content) -> list[dict]:
+    return [json.loads(line) async for line in content]
+
+
+def test_invoices_are_read_by_page_range_from_a_file(pool, tmp_path):
+    pdf = generate_bundle([(10, 1), (30, 2), (5, 1)])
+
+    async def scenario():
+        content, cleanup = await file_controller.stream_file(
+            TYPE, upload(pdf), bypass_cache=True
+        )
+        return await collect(content), cleanup
+
+    lines, cleanup = asyncio.run(scenario())
+
+    assert [len(line["produtos"]) for line in lines] == [10, 30, 5]
+    assert [line["paginas"] for line in lines] == [[1, 1], [2, 3], [4, 4]]
+
+    extractions = [args for name, args in pool.calls if name == "extract_text"]
+    assert all(isinstance(args[1], str) for args in extractions)
+    assert [args[2:] for args in extractions] == [(0, 1), (1, 3), (3, 4)]
+
+    cleanup()
+    assert not os.listdir(tmp_path)
+
+
+def test_cleanup_runs_without_consuming_the_stream(pool, tmp_path):
+    pdf = generate_bundle([(10, 1), (10, 1)])
+
+    _, cleanup = asyncio.run(
+        file_controller.stream_file(TYPE, upload(pdf), bypass_cache=True)
+    )
+    assert os.listdir(tmp_path)
+
+    cleanup()
+    assert not os.listdir(tmp_path)
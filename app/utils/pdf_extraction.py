@@ -1,41 +1,240 @@
 """PDF Extraction"""
 
 import os
+import re
+from collections.abc import Iterator
 
 import fitz
 from fastapi import HTTPException, status
 
 from app import modules
+from app.utils import pdf_table
 
+# Tipo especial: o módulo é identificado pela primeira página do PDF
+AUTO_TYPE = "auto"
 
-def extract_text(type: str, pdf_path: str):
-    if not hasattr(modules, type):
+# Chave de acesso da NF-e: 44 dígitos, impressa em grupos de 4 no DANFE
+ACCESS_KEY = re.compile(r"(?<!\d)(?:\d{4}[ .]?){10}\d{4}(?!\d)")
+
+
+def check_type(type: str):
+    if type != AUTO_TYPE and not modules.exists(type):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Módulo {type} não encontrado",
         )
 
-    if not os.path.exists(pdf_path):
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="O arquivo não foi encontrado",
-        )
+
+def get_module(type: str):
+    check_type(type)
+
+    return modules.load(type)
+
+
+def detect_type(pdf: str | bytes) -> str | None:
+    """Identifica o módulo do PDF lendo apenas a primeira página"""
+    _check_path(pdf)
 
     try:
-        with fitz.open(pdf_path) as doc:
-            content = ""
+        with open_pdf(pdf) as doc:
+            if not doc.page_count:
+                return None
+
+            return modules.detect(doc[0].get_text("text"))
 
-            for page in doc:
-                content += page.get_text("text")
+    except Exception as e:
+        raise ValueError(f"Erro ao processar o PDF: {str(e)}") from e
+
+
+def open_pdf(pdf: str | bytes) -> fitz.Document:
+    """Abre o PDF a partir de um caminho ou direto do buffer em memória"""
+    if isinstance(pdf, (bytes, bytearray, memoryview)):
+        return fitz.open(stream=pdf, filetype="pdf")
 
-            module = getattr(modules, type)
+    return fitz.open(pdf)
 
-            response = module.create_df(content)
 
-        return response
+def page_count(pdf: str | bytes) -> int:
+    _check_path(pdf)
+
+    try:
+        with open_pdf(pdf) as doc:
+            return doc.page_count
 
     except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Erro ao processar o PDF: {str(e)}",
-        )
+        raise ValueError(f"Erro ao processar o PDF: {str(e)}") from e
+
+
+def shard_pages(pages: int, shards: int) -> list[tuple[int, int]]:
+    """Divide as páginas em faixas contíguas [início, fim) de tamanho igual"""
+    shards = max(1, min(shards, pages))
+    size, rest = divmod(pages, shards)
+
+    ranges = []
+    start = 0
+    for i in range(shards):
+        stop = start + size + (1 if i < rest else 0)
+        ranges.append((start, stop))
+        start = stop
+
+    return ranges
+
+
+def read_rows(
+    pages: Iterator[fitz.Page], table: dict
+) -> tuple[list[list[str]], int | None, bool]:
+    """
+    Lê as linhas da tabela de itens página a página até o marcador de fim.
+    Páginas sem cabeçalho depois do início da tabela são lidas com o
+    layout da página anterior.
+
+    Devolve as linhas, quantas páginas foram lidas antes do cabeçalho
+    (None se a tabela não começa nessas páginas) e se o fim foi encontrado.
+    """
+    rows = []
+    layout = None
+    leading = 0
+
+    for page in pages:
+        page_rows, layout, ended = pdf_table.extract_rows(page, table, layout)
+        rows.extend(page_rows)
+
+        if layout is None:
+            leading += 1
+        elif ended:
+            return rows, leading, True
+
+    return rows, None if layout is None else leading, False
+
+
+def access_key(pdf: str | bytes) -> str | None:
+    """Chave de acesso da primeira nota do PDF, lida na primeira página"""
+    _check_path(pdf)
+
+    try:
+        with open_pdf(pdf) as doc:
+            if not doc.page_count:
+                return None
+
+            match = ACCESS_KEY.search(doc[0].get_text("text"))
+
+    except Exception as e:
+        raise ValueError(f"Erro ao processar o PDF: {str(e)}") from e
+
+    return re.sub(r"\D", "", match.group()) if match else None
+
+
+def split_invoices(pdf: str | bytes) -> list[tuple[int, int, str | None]]:
+    """
+    Divide o documento nas notas que ele contém, pela chave de acesso
+    impressa em cada página. Páginas sem chave continuam a nota anterior.
+
+    Devolve (início, fim, chave) de cada nota, com fim exclusivo.
+    """
+    _check_path(pdf)
+
+    try:
+        with open_pdf(pdf) as doc:
+            matches = [
+                ACCESS_KEY.search(page.get_text("text")) for page in doc
+            ]
+
+    except Exception as e:
+        raise ValueError(f"Erro ao processar o PDF: {str(e)}") from e
+
+    invoices = []
+    for number, match in enumerate(matches):
+        key = re.sub(r"\D", "", match.group()) if match else None
+        current = invoices[-1] if invoices else None
+
+        if current is None or (key and current[2] not in {None, key}):
+            invoices.append([number, number + 1, key])
+        else:
+            current[1] = number + 1
+            current[2] = current[2] or key
+
+    return [tuple(invoice) for invoice in invoices]
+
+
+def extract_pages(
+    type: str, pdf: str | bytes, start: int = 0, stop: int | None = None
+) -> tuple[list[list[str]], int | None, bool]:
+    """
+    Extrai as linhas da tabela de itens (TABLE do módulo) das páginas
+    [start, stop), reconstruídas pelas coordenadas (ver read_rows). O
+    documento é aberto de forma independente, o que permite rodar cada
+    faixa em um processo. Junte as faixas com join_pages.
+    """
+    _check_path(pdf)
+    table = modules.load(type).TABLE
+
+    try:
+        with open_pdf(pdf) as doc:
+            stop = doc.page_count if stop is None else stop
+            pages = (doc[number] for number in range(start, stop))
+
+            return read_rows(pages, table)
+
+    except Exception as e:
+        raise ValueError(f"Erro ao processar o PDF: {str(e)}") from e
+
+
+def join_pages(
+    parts: list[tuple[list[list[str]], int | None, bool]],
+) -> list[list[str]] | None:
+    """
+    Junta, na ordem das páginas, as linhas extraídas por faixa. As linhas
+    da tabela vão até a faixa que contém o marcador de fim; sem ele, a
+    tabela está truncada e a leitura falha.
+
+    Devolve None quando uma faixa começa no meio da tabela em uma página
+    sem cabeçalho: essa faixa só pode ser lida junto com a anterior.
+    """
+    rows = []
+    started = False
+
+    for part_rows, leading, ended in parts:
+        if started and leading != 0:
+            return None
+
+        rows.extend(part_rows)
+        started = started or leading is not None
+
+        if ended:
+            return rows
+
+    if started:
+        raise ValueError("Fim da tabela de itens não encontrado")
+
+    return rows
+
+
+def build_products(type: str, rows: list[list[str]]) -> list[dict]:
+    """Monta o DataFrame do módulo e os produtos a partir dele"""
+    module = modules.load(type)
+
+    try:
+        return module.create_products(module.create_df(rows))
+
+    except Exception as e:
+        raise ValueError(f"Erro ao processar o PDF: {str(e)}") from e
+
+
+def extract_text(
+    type: str, pdf: str | bytes, start: int = 0, stop: int | None = None
+) -> list[dict]:
+    """
+    Extrai os produtos das páginas [start, stop) do PDF, faltando apenas o
+    nome inferido pelo Gemini.
+
+    Executado no pool de processos, por isso só levanta exceções
+    simples (HTTPException não é serializável entre processos).
+    """
+    return build_products(
+        type, join_pages([extract_pages(type, pdf, start, stop)])
+    )
+
+
+def _check_path(pdf: str | bytes):
+    if isinstance(pdf, str) and not os.path.exists(pdf):
+        raise FileNotFoundError("O arquivo não foi encontrado")
@@ -0,0 +1,159 @@
+"""PDF Table Extraction"""
+
+from bisect import bisect_right
+from itertools import groupby
+from operator import itemgetter
+
+import fitz
+
+# Folga (em pontos) ao comparar coordenadas verticais
+TOLERANCE = 1.0
+
+
+def _lines(words: list[tuple]) -> list[dict]:
+    """Agrupa as palavras nas linhas do PyMuPDF, na ordem de leitura"""
+    lines = []
+    for _, group in groupby(words, key=itemgetter(5, 6)):
+        x0, y0, x1, y1, text, *_ = zip(*group)
+        lines.append(
+            {
+                "text": " ".join(text),
+                "x0": min(x0),
+                "y0": min(y0),
+                "x1": max(x1),
+                "y1": max(y1),
+            }
+        )
+    return lines
+
+
+def _find_top(lines: list[dict], header: tuple[str, ...]) -> float | None:
+    """Fim do cabeçalho da tabela, ou None se a página não o tiver"""
+    size = len(header)
+
+    for i in range(len(lines) - size + 1):
+        window = lines[i : i + size]
+        if all(line["text"] == text for line, text in zip(window, header)):
+            return max(line["y1"] for line in window)
+
+    return None
+
+
+def _find_end(lines: list[dict], end: str, top: float) -> float | None:
+    """Início do rodapé da tabela, ou None se ela continua na próxima"""
+    return min(
+        (
+            line["y0"]
+            for line in lines
+            if end in line["text"] and line["y0"] >= top
+        ),
+        default=None,
+    )
+
+
+def _column_limits(table: list[dict], columns: int) -> list[float] | None:
+    """
+    Limites entre as colunas pelas células de todas as linhas de itens:
+    células que se sobrepõem na horizontal pertencem à mesma coluna, então
+    uma célula vazia em uma linha é coberta pelas demais. None quando as
+    células não formam `columns` colunas (coluna vazia em toda a página).
+    """
+    spans = []
+    for line in sorted(table, key=lambda line: line["x0"]):
+        if spans and line["x0"] <= spans[-1][1]:
+            spans[-1][1] = max(spans[-1][1], line["x1"])
+        else:
+            spans.append([line["x0"], line["x1"]])
+
+    if len(spans) != columns:
+        return None
+
+    return [(left[1] + right[0]) / 2 for left, right in zip(spans, spans[1:])]
+
+
+def extract_rows(
+    page: fitz.Page,
+    table: dict,
+    layout: tuple[float, list[float]] | None = None,
+) -> tuple[list[list[str]], tuple[float, list[float]] | None, bool]:
+    """
+    Reconstrói as linhas da tabela de itens pelas coordenadas das palavras,
+    em uma única leitura da página. Descrições quebradas em mais de uma
+    linha continuam na mesma célula.
+
+    O dicionário table (TABLE do módulo) informa:
+
+    - header: textos das últimas linhas do cabeçalho da tabela.
+    - end: texto que marca o fim da tabela.
+    - columns: quantidade de colunas da tabela.
+    - clip: região (x0, y0, x1, y1) da página onde fica a tabela, opcional.
+
+    layout é o (topo, limites das colunas) da página anterior da tabela,
+    usado em páginas sem cabeçalho ou sem todas as colunas preenchidas.
+
+    Devolve as linhas, o layout desta página (None enquanto a tabela não
+    começou) e se o marcador de fim foi encontrado.
+    """
+    columns = table["columns"]
+    clip = table.get("clip")
+    words = page.get_text("words", clip=clip)
+    lines = _lines(words)
+
+    top = _find_top(lines, table["header"])
+    if top is None:
+        if layout is None:
+            return [], None, False
+        top = layout[0]
+
+    bottom = _find_end(lines, table["end"], top)
+    ended = bottom is not None
+    if bottom is None:
+        bottom = clip[3] if clip else page.rect.height
+
+    items = [
+        line
+        for line in lines
+        if line["y0"] >= top - TOLERANCE and line["y1"] <= bottom + TOLERANCE
+    ]
+    if not items:
+        return [], (top, layout[1] if layout else []), ended
+
+    limits = _column_limits(items, columns)
+    if limits is None:
+        if not layout or not layout[1]:
+            raise ValueError(
+                f"Tabela de itens sem as {columns} colunas preenchidas"
+            )
+        limits = layout[1]
+
+    cells = [
+        (word, bisect_right(limits, (word[0] + word[2]) / 2))
+        for word in words
+        if word[1] >= top - TOLERANCE and word[3] <= bottom + TOLERANCE
+    ]
+
+    # Cada item começa em uma linha com texto na primeira coluna
+    starts = sorted(
+        {round(word[1], 1) for word, column in cells if column == 0}
+    )
+
+    rows = [[[] for _ in range(columns)] for _ in starts]
+    for word, column in cells:
+        index = bisect_right(starts, word[1] + TOLERANCE) - 1
+        if index >= 0:
+            rows[index][column].append(word)
+
+    return (
+        [
+            [
+                " ".join(
+                    word[4]
+                    for word in sorted(cell, key=lambda w: (w[1], w[0]))
+                )
+                for cell in row
+            ]
+            for row in rows
+        ],
+        (top, limits),
+        ended,
+    )
@@ -1,7 +1,51 @@
 """PDF Transformation"""
 
+import re
+import unicodedata
+
 import pandas as pd
 
 
-def transform_df(df: pd.DataFrame):
-    df.to_string(buf="app/upload/products.txt", index=False)
+def parse_decimals(values: pd.Series) -> pd.Series:
+    """
+    Converte uma coluna de números no formato brasileiro ("1.234,56") para
+    float. Valores que não são números levantam ValueError, já que indicam
+    colunas desalinhadas.
+    """
+    parsed = pd.to_numeric(
+        values.str.strip()
+        .str.replace(".", "", regex=False)
+        .str.replace(",", ".", regex=False),
+        errors="coerce",
+    )
+
+    invalid = parsed.isna()
+    if invalid.any():
+        position = invalid.to_numpy().argmax()
+        raise ValueError(
+            f"Valor inválido na coluna {values.name} (item {position + 1}): "
+            f"{values.iloc[position]!r}"
+        )
+
+    return parsed
+
+
+def slugify(value: str) -> str:
+    """Minúsculas, sem acentos nem caracteres especiais, espaços viram "-" """
+    value = unicodedata.normalize("NFKD", value)
+    value = value.encode("ascii", "ignore").decode("ascii").lower()
+    value = re.sub(r"[^a-z0-9\s-]", "", value)
+    return re.sub(r"[\s-]+", "-", value).strip("-")
+
+
+def transform_products(products: list[dict], columns: tuple[str, ...]) -> str:
+    """
+    Serializa para o prompt apenas as colunas usadas pelo Gemini, separadas
+    por tabulação, com uma linha de cabeçalho e sem linhas repetidas.
+    """
+    rows = dict.fromkeys(
+        "\t".join(" ".join(str(product[column]).split()) for column in columns)
+        for product in products
+    )
+
+    return "\n".join(["\t".join(columns), *rows])
@@ -1,10 +1,29 @@
+from contextlib import asynccontextmanager
+
+from anyio import to_thread
 from fastapi import FastAPI
 
 from fastapi.middleware.cors import CORSMiddleware
 
+from app.config import THREADPOOL_SIZE
+from app.controllers import file_controller
+from app.gemini.provider import provider
 from app.routers import crm, files
 
-app = FastAPI(title="PyAssistant Server")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Consultas ao banco (CRM, SKUs e catálogo) rodam nesse pool de threads
+    to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_SIZE
+    file_controller.job_manager.start()
+    await file_controller.catalog_manager.refresh()
+    yield
+    await file_controller.job_manager.stop()
+    file_controller.pool_manager.shutdown()
+    await provider.aclose()
+
+
+app = FastAPI(title="PyAssistant Server", lifespan=lifespan)
 
 app.include_router(files.router)
 app.include_router(crm.router)
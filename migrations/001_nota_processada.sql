@@ -0,0 +1,9 @@
+-- Notas já somadas ao estoque pela ingestão (?persist=true). A chave da
+-- nota (chave de acesso da NF-e ou SHA-256 do conteúdo) é registrada na
+-- mesma transação do upsert em produto; uma nota repetida não soma de novo.
+CREATE TABLE IF NOT EXISTS nota_processada (
+    chave VARCHAR(64) PRIMARY KEY,
+    marca_id UUID REFERENCES marca (id),
+    itens INTEGER,
+    processada_em TIMESTAMP(6)
+);